@@ -1,24 +1,92 @@
 import os 
-from jose import jwt 
+import asyncio
+import threading
+import multiprocessing
+from time import time
+from typing import Any, Callable
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from jose import jwt, JWTError, ExpiredSignatureError
 from typing import Optional
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from passlib.hash import argon2
 from passlib.context import CryptContext
 
+from app.core.cache import TTLCache
+
 load_dotenv(override=True)
 
 JWT_SECRET = os.getenv("SECRET_KEY")
 JWT_ALGORITHM = os.getenv("HASHING_ALGORITHM")
 ACCESS_TOKEN_EXPIRES_MINUTES = 60
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+
+#--- verified token -> claims, every entry expires together with its token
+token_cache = TTLCache(AUTH_TOKEN_CACHE_SIZE)
+
+#--- unset: the installed passlib defaults, which existing hashes were made with.
+#--- Hashes made with other parameters are upgraded on the next successful login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", str(argon2.default_rounds)))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", str(argon2.memory_cost)))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", str(argon2.parallelism)))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+#--- running + queued password operations, past this the API answers 503
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2"], 
+    deprecated="auto",
+    argon2__time_cost=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM)
+
+_password_executor: ProcessPoolExecutor | None = None
+_password_executor_lock = threading.Lock()
+_password_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    #--- (verified, new hash when the stored one uses outdated parameters)
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(plain_password: str) -> str:
     return pwd_context.hash(plain_password)
 
+def get_password_executor() -> ProcessPoolExecutor:
+    #--- spawn: the API process runs threads, forking it is not safe
+    global _password_executor
+    with _password_executor_lock:
+        if _password_executor is None:
+            _password_executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"))
+        return _password_executor
+
+def shutdown_password_executor() -> None:
+    global _password_executor
+    with _password_executor_lock:
+        if _password_executor is not None:
+            _password_executor.shutdown(wait=True, cancel_futures=True)
+            _password_executor = None
+
+async def run_password_task(function: Callable[..., Any], *args: Any) -> Any:
+    #--- Argon2 runs in the process pool, never on the event loop or the
+    #--- request threadpool. A full pool is rejected right away instead of
+    #--- queueing logins behind each other.
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503, 
+            detail="Too many concurrent authentication requests, try again shortly",
+            headers={"Retry-After": "1"})
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_password_executor(), function, *args)
+    finally:
+        _password_slots.release()
+
 def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
     now = datetime.now()
     if expires_delta:
@@ -40,15 +108,23 @@ def create_access_token(subject: str, expires_delta: Optional[timedelta] = None)
     return token
 
 def decode_token(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError as e:
+    except ExpiredSignatureError as e:
         print(f"Expired signature error:\n {e}")
         raise 
-    except jwt.PyJWTError as e:
-        print(f"PyJWT error:\n {e}")
+    except JWTError as e:
+        print(f"JWT error:\n {e}")
         raise
+    #--- tokens without exp are verified on every request
+    if isinstance(payload.get("exp"), (int, float)):
+        ttl = payload["exp"] - time()
+        if ttl > 0:
+            token_cache.set(token, payload, ttl=ttl)
+    return payload
 
 
 
@@ -0,0 +1,179 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from time import time
+from typing import Any, Callable
+from dotenv import load_dotenv
+
+from app.core.cache import TTLCache
+
+load_dotenv(override=True)
+
+INFERENCE_CACHE_ENABLED = os.getenv("INFERENCE_CACHE_ENABLED", "true").lower() == "true"
+INFERENCE_CACHE_PATH = os.getenv("INFERENCE_CACHE_PATH", os.path.join(".cache", "inference_cache.sqlite3"))
+INFERENCE_CACHE_MAX_BYTES = int(os.getenv("INFERENCE_CACHE_MAX_BYTES", str(1024 ** 3)))
+INFERENCE_CACHE_MEMORY_ITEMS = int(os.getenv("INFERENCE_CACHE_MEMORY_ITEMS", "10000"))
+SQLITE_MAX_VARIABLES = 500
+
+def encode_embedding(embedding: np.ndarray) -> bytes:
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+def decode_embedding(value: bytes) -> np.ndarray:
+    return np.frombuffer(value, dtype=np.float32)
+
+def encode_json(value: Any) -> bytes:
+    return json.dumps(value).encode("utf-8")
+
+def decode_json(value: bytes) -> Any:
+    return json.loads(value)
+
+class InferenceCache:
+    #--- content-addressed cache of model outputs, keyed by sha256(model id, normalized text).
+    #--- In-memory LRU in front of a SQLite file shared by all worker processes,
+    #--- the file is trimmed by least recent access once it grows past max_bytes.
+    def __init__(self,
+                 model_id: str,
+                 encode: Callable[[Any], bytes],
+                 decode: Callable[[bytes], Any],
+                 path: str = INFERENCE_CACHE_PATH,
+                 max_bytes: int = INFERENCE_CACHE_MAX_BYTES,
+                 memory_items: int = INFERENCE_CACHE_MEMORY_ITEMS):
+        self.model_id = model_id
+        self.encode = encode
+        self.decode = decode
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_cache = TTLCache(memory_items)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk_bytes = 0
+        self._connection: sqlite3.Connection | None = None
+        self._connection_pid: int | None = None
+        self._lock = threading.Lock()
+
+    def make_key(self, text: str) -> str:
+        normalized_text = " ".join(text.split())
+        return hashlib.sha256(f"{self.model_id}\0{normalized_text}".encode("utf-8")).hexdigest()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is not None and self._connection_pid == os.getpid():
+            return self._connection
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS inference_cache ("
+            "key TEXT PRIMARY KEY, "
+            "value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "last_access REAL NOT NULL)")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_inference_cache_last_access "
+            "ON inference_cache (last_access)")
+        connection.commit()
+        self._disk_bytes = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM inference_cache").fetchone()[0]
+        self._connection = connection
+        self._connection_pid = os.getpid()
+        return connection
+
+    def _read_from_disk(self, keys: list[str]) -> dict[str, bytes]:
+        found = {}
+        with self._lock:
+            connection = self._get_connection()
+            for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                batch = keys[start:start + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(batch))
+                rows = connection.execute(
+                    f"SELECT key, value FROM inference_cache WHERE key IN ({placeholders})",
+                    batch).fetchall()
+                found.update(rows)
+                if rows:
+                    connection.execute(
+                        f"UPDATE inference_cache SET last_access = ? WHERE key IN ({placeholders})",
+                        [time(), *batch])
+            connection.commit()
+        return found
+
+    def get_many(self, texts: list[str]) -> list[Any | None]:
+        #--- every key is looked up once, hits and misses are counted per position
+        keys = [self.make_key(text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        cached_values = {key: self.memory_cache.get(key) for key in unique_keys}
+        missing_keys = [key for key, value in cached_values.items() if value is None]
+        disk_keys = set()
+        if missing_keys:
+            try:
+                found = self._read_from_disk(missing_keys)
+            except sqlite3.Error as e:
+                print(f"[InferenceCache]\tCould not read from {self.path}: {e}")
+                found = {}
+            for key, value in found.items():
+                cached_values[key] = self.decode(value)
+                self.memory_cache.set(key, cached_values[key])
+            disk_keys = set(found)
+        values = [cached_values[key] for key in keys]
+        for key, value in zip(keys, values):
+            if value is None:
+                self.misses += 1
+            elif key in disk_keys:
+                self.disk_hits += 1
+            else:
+                self.memory_hits += 1
+        return values
+
+    def put_many(self, texts: list[str], values: list[Any]) -> None:
+        rows = {}
+        for text, value in zip(texts, values):
+            key = self.make_key(text)
+            if key in rows:
+                continue
+            self.memory_cache.set(key, value)
+            encoded_value = self.encode(value)
+            rows[key] = (key, encoded_value, len(encoded_value), time())
+        rows = list(rows.values())
+        try:
+            with self._lock:
+                connection = self._get_connection()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO inference_cache (key, value, size, last_access) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows)
+                connection.commit()
+                self._disk_bytes += sum(row[2] for row in rows)
+                if self._disk_bytes > self.max_bytes:
+                    self._evict(connection)
+        except sqlite3.Error as e:
+            print(f"[InferenceCache]\tCould not write to {self.path}: {e}")
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        #--- trim to 90% of max_bytes, so eviction doesn't run on every put
+        self._disk_bytes = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM inference_cache").fetchone()[0]
+        bytes_to_free = self._disk_bytes - int(self.max_bytes * 0.9)
+        keys_to_delete = []
+        rows = connection.execute("SELECT key, size FROM inference_cache ORDER BY last_access")
+        for key, size in rows:
+            if bytes_to_free <= 0:
+                break
+            keys_to_delete.append((key,))
+            bytes_to_free -= size
+            self._disk_bytes -= size
+        rows.close()
+        connection.executemany("DELETE FROM inference_cache WHERE key = ?", keys_to_delete)
+        connection.commit()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_bytes": self._disk_bytes,
+        }
@@ -0,0 +1,256 @@
+import os
+import bisect
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+from typing import Callable, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+#--- first port tried by worker processes, every process on a host takes the
+#--- next free one within METRICS_PORT_RANGE. 0 disables the worker endpoint.
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+METRICS_PORT_RANGE = int(os.getenv("METRICS_PORT_RANGE", "32"))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{escape_label_value(value)}"'
+        for name, value in zip(label_names, label_values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def label_values(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = self.header()
+        for label_values, value in values:
+            lines.append(f"{self.name}{format_labels(self.label_names, label_values)} {format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self.label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self.label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 label_names: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        #--- per label set: [count per bucket (+Inf last), sum], cumulated at render time
+        key = self.label_values(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bucket] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        lines = self.header()
+        for label_values, (counts, total) in values:
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_label = f'le="{format_value(upper_bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{format_labels(self.label_names, label_values, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, label_values)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, label_values)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class: type, name: str, *args, **kwargs) -> Metric:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, label_names)
+
+    def gauge(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, label_names)
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  label_names: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, label_names, buckets)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        #--- called on every scrape, for values that are read rather than counted
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception as e:
+                print(f"[Metrics]\tCollector {collector.__name__} failed: {e}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry()
+
+STAGE_SECONDS = metrics_registry.histogram(
+    "documind_stage_seconds",
+    "Time spent per pipeline stage",
+    ("pipeline", "stage"))
+TASKS_TOTAL = metrics_registry.counter(
+    "documind_tasks_total",
+    "Worker tasks processed, by final status",
+    ("task_type", "status"))
+PAGES_TOTAL = metrics_registry.counter(
+    "documind_pages_total",
+    "Document pages extracted",
+    ("pipeline",))
+CHUNKS_TOTAL = metrics_registry.counter(
+    "documind_chunks_total",
+    "Chunks processed",
+    ("pipeline",))
+TOKENS_TOTAL = metrics_registry.counter(
+    "documind_tokens_total",
+    "Whitespace tokens processed",
+    ("pipeline",))
+BYTES_TOTAL = metrics_registry.counter(
+    "documind_bytes_total",
+    "Document bytes processed",
+    ("pipeline",))
+QUEUE_DEPTH = metrics_registry.gauge(
+    "documind_queue_depth",
+    "Queued worker tasks",
+    ("task_type",))
+QUEUE_OLDEST_AGE_SECONDS = metrics_registry.gauge(
+    "documind_queue_oldest_age_seconds",
+    "Age of the oldest queued worker task",
+    ("task_type",))
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    "documind_http_request_seconds",
+    "API request latency per route",
+    ("method", "route", "status"))
+
+def collect_queue_metrics() -> None:
+    from app.database import get_session
+    from app.services import task_service
+    from app.core.enum.worker_task_type import WorkerTaskType
+
+    db = get_session()
+    try:
+        queue_stats = task_service.get_queue_stats(db)
+    finally:
+        db.close()
+    for task_type in WorkerTaskType:
+        stats = queue_stats.get(task_type.value, {})
+        QUEUE_DEPTH.set(stats.get("queued", 0), task_type=task_type.value)
+        QUEUE_OLDEST_AGE_SECONDS.set(stats.get("oldest_age_seconds", 0.0), task_type=task_type.value)
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics_registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port: int = WORKER_METRICS_PORT) -> ThreadingHTTPServer | None:
+    #--- /metrics on a daemon thread, so scrapes never block the worker loop
+    if port <= 0:
+        return None
+    metrics_registry.add_collector(collect_queue_metrics)
+    for candidate_port in range(port, port + METRICS_PORT_RANGE):
+        try:
+            server = ThreadingHTTPServer(("0.0.0.0", candidate_port), MetricsRequestHandler)
+        except OSError:
+            continue
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"[Metrics]\tServing /metrics on port {candidate_port} (pid: {os.getpid()})")
+        return server
+    print(f"[Metrics]\tNo free port in {port}-{port + METRICS_PORT_RANGE - 1}, metrics endpoint disabled")
+    return None
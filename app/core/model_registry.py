@@ -0,0 +1,86 @@
+import os
+import importlib
+import threading
+from time import perf_counter
+from typing import Any, Callable
+from dotenv import load_dotenv
+
+load_dotenv(override=True)
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-mpnet-base-v2")
+
+class ModelRegistry:
+    #--- models are registered as loaders and only built on first get(), so no
+    #--- module in the API import graph pays for torch/transformers. Worker entry
+    #--- points call warmup() to load (and run once) before taking tasks.
+    def __init__(self):
+        self._loaders: dict[str, tuple[Callable[[], Any], Callable[[Any], None] | None, tuple[str, ...]]] = {}
+        self._models: dict[str, Any] = {}
+        self._timings: dict[str, dict[str, float]] = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._loaders
+
+    def register(
+            self,
+            name: str,
+            loader: Callable[[], Any],
+            warmup: Callable[[Any], None] | None = None,
+            imports: tuple[str, ...] = ()) -> None:
+        with self._lock:
+            self._loaders[name] = (loader, warmup, imports)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def get(self, name: str) -> Any:
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"No model registered under: {name}")
+        with self._lock:
+            if name not in self._models:
+                loader, _, imports = self._loaders[name]
+                timings = self._timings.setdefault(name, {})
+                started = perf_counter()
+                for module_name in imports:
+                    importlib.import_module(module_name)
+                loaded = perf_counter()
+                self._models[name] = loader()
+                timings["import_seconds"] = loaded - started
+                timings["load_seconds"] = perf_counter() - loaded
+                print(f"[ModelRegistry]\tLoaded {name} in {perf_counter() - started:.2f}s")
+            return self._models[name]
+
+    def warmup(self, *names: str) -> None:
+        for name in names or tuple(self._loaders):
+            model = self.get(name)
+            warmup = self._loaders[name][1]
+            if warmup is None:
+                continue
+            started = perf_counter()
+            warmup(model)
+            self._timings[name]["warmup_seconds"] = perf_counter() - started
+
+    def unload(self, name: str) -> None:
+        with self._lock:
+            self._models.pop(name, None)
+
+    def timings(self) -> dict[str, dict[str, float]]:
+        return {name: dict(timings) for name, timings in self._timings.items()}
+
+def load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def warmup_embedding_model(model) -> None:
+    model.encode(["DocuMind warmup"], show_progress_bar=False)
+
+model_registry = ModelRegistry()
+model_registry.register(
+    "embedding",
+    load_embedding_model,
+    warmup=warmup_embedding_model,
+    imports=("sentence_transformers",))
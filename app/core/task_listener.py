@@ -0,0 +1,89 @@
+import os
+import select
+from time import sleep
+from dotenv import load_dotenv
+
+from app.database import engine
+from app.services import task_service
+
+load_dotenv(override=True)
+
+#--- auto: LISTEN/NOTIFY on Postgres, polling everywhere else
+TASK_WAKEUP_BACKEND = os.getenv("TASK_WAKEUP_BACKEND", "auto")
+TASK_FALLBACK_POLL_SECONDS = float(os.getenv("TASK_FALLBACK_POLL_SECONDS", "60"))
+
+class PollingTaskListener:
+    def __init__(self, task_type: str, poll_interval: float):
+        self.task_type = task_type
+        self.poll_interval = poll_interval
+
+    def wait(self) -> bool:
+        sleep(self.poll_interval)
+        return False
+
+    def close(self) -> None:
+        pass
+
+class PostgresTaskListener:
+    def __init__(self, task_type: str, fallback_interval: float):
+        self.channel = task_service.get_task_channel(task_type)
+        self.fallback_interval = fallback_interval
+        self.connection = None
+        #--- LISTEN before the first claim, so no notification is lost in between
+        self._connect()
+
+    def _connect(self) -> None:
+        try:
+            self.connection = engine.raw_connection()
+            dbapi_connection = self.connection.dbapi_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+        except Exception as e:
+            print(f"[TaskListener]\tCould not listen on channel {self.channel}: {e}")
+            self.close()
+
+    def _drain_notifications(self) -> bool:
+        dbapi_connection = self.connection.dbapi_connection
+        dbapi_connection.poll()
+        notified = len(dbapi_connection.notifies) > 0
+        dbapi_connection.notifies.clear()
+        return notified
+
+    def wait(self) -> bool:
+        #--- blocks until a task is queued or the fallback interval passes,
+        #--- returns True when woken up by a notification
+        if self.connection is None:
+            sleep(min(self.fallback_interval, 5))
+            self._connect()
+            return False
+        try:
+            if self._drain_notifications():
+                return True
+            dbapi_connection = self.connection.dbapi_connection
+            ready, _, _ = select.select([dbapi_connection], [], [], self.fallback_interval)
+            if not ready:
+                return False
+            return self._drain_notifications()
+        except Exception as e:
+            print(f"[TaskListener]\tLost connection on channel {self.channel}: {e}")
+            self.close()
+            return False
+
+    def close(self) -> None:
+        if self.connection is not None:
+            try:
+                self.connection.invalidate()
+            except Exception:
+                pass
+        self.connection = None
+
+def get_task_listener(
+        task_type: str, 
+        poll_interval: float) -> PollingTaskListener | PostgresTaskListener:
+    backend = TASK_WAKEUP_BACKEND
+    if backend == "auto":
+        backend = "listen" if engine.dialect.name == "postgresql" else "poll"
+    if backend == "listen":
+        return PostgresTaskListener(task_type, TASK_FALLBACK_POLL_SECONDS)
+    return PollingTaskListener(task_type, poll_interval)
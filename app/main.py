@@ -1,8 +1,11 @@
 from art import *  # noqa: F403
-from fastapi import FastAPI
+from time import perf_counter
+from fastapi import FastAPI, Request
 
-from app.routes import auth, document, document_metadata, nlp
+from app.routes import auth, document, document_metadata, nlp, search, metrics
 from app.database import Base, engine
+from app.auth import shutdown_password_executor
+from app.core.metrics import metrics_registry, collect_queue_metrics, HTTP_REQUEST_SECONDS
 
 
 app = FastAPI(title="DocuMind API")
@@ -11,6 +14,27 @@ app = FastAPI(title="DocuMind API")
 async def startup_event():
     tprint("DocuMind") # noqa
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_password_executor()
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    #--- labelled by route template (/documents/{id}), not by raw path
+    started = perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            perf_counter() - started,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=str(status_code))
+
 @app.get("/")
 def main():
     return {"message": "connected to DocuMind API!"}
@@ -20,4 +44,8 @@ Base.metadata.create_all(bind=engine)
 app.include_router(auth.router)
 app.include_router(document.router)
 app.include_router(document_metadata.router)
-app.include_router(nlp.router)
\ No newline at end of file
+app.include_router(nlp.router)
+app.include_router(search.router)
+app.include_router(metrics.router)
+
+metrics_registry.add_collector(collect_queue_metrics)
\ No newline at end of file
@@ -0,0 +1,7 @@
+from sqlalchemy.engine import Connection
+
+from app.migrations.utils import add_column_if_missing
+
+def upgrade(connection: Connection) -> None:
+    add_column_if_missing(connection, "worker_tasks", "worker_id", "VARCHAR")
+    add_column_if_missing(connection, "worker_tasks", "claimed_at", "TIMESTAMP")
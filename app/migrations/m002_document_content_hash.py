@@ -0,0 +1,11 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.migrations.utils import add_column_if_missing
+
+def upgrade(connection: Connection) -> None:
+    add_column_if_missing(connection, "documents", "content_hash", "VARCHAR(64)")
+    add_column_if_missing(connection, "documents", "processed_at", "TIMESTAMP WITH TIME ZONE")
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_documents_user_id_content_hash "
+        "ON documents (user_id, content_hash)"))
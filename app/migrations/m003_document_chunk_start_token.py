@@ -0,0 +1,6 @@
+from sqlalchemy.engine import Connection
+
+from app.migrations.utils import add_column_if_missing
+
+def upgrade(connection: Connection) -> None:
+    add_column_if_missing(connection, "document_chunks", "start_token", "INTEGER")
@@ -0,0 +1,7 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+def upgrade(connection: Connection) -> None:
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_document_chunks_document_id_index "
+        "ON document_chunks (document_id, \"index\")"))
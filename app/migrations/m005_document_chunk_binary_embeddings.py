@@ -0,0 +1,85 @@
+import os
+import json
+import numpy as np
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.migrations.utils import table_exists, column_exists, add_column_if_missing
+from app.models.types import EMBEDDING_STORAGE_DTYPE
+
+EMBEDDING_MIGRATION_BATCH_SIZE = int(os.getenv("EMBEDDING_MIGRATION_BATCH_SIZE", "1000"))
+
+def is_json_column(connection: Connection, table_name: str, column_name: str) -> bool:
+    for column in inspect(connection).get_columns(table_name):
+        if column["name"] == column_name:
+            return "JSON" in str(column["type"]).upper()
+    return False
+
+def needs_conversion(connection: Connection) -> bool:
+    #--- fresh databases have the column created binary already
+    if not table_exists(connection, "document_chunks"):
+        return False
+    return column_exists(connection, "document_chunks", "embeddings_binary") \
+        or is_json_column(connection, "document_chunks", "embeddings")
+
+def add_binary_column(connection: Connection) -> None:
+    binary_type = "BYTEA" if connection.dialect.name == "postgresql" else "BLOB"
+    add_column_if_missing(connection, "document_chunks", "embeddings_binary", binary_type)
+
+def convert_batch(connection: Connection, last_id: int) -> tuple[int, int] | None:
+    #--- keyset pagination by id, one executemany UPDATE; returns (last id,
+    #--- rows converted), None once no unconverted rows are left
+    dtype = np.dtype(EMBEDDING_STORAGE_DTYPE).newbyteorder("<")
+    rows = connection.execute(
+        text(
+            "SELECT id, embeddings FROM document_chunks "
+            "WHERE id > :last_id AND embeddings IS NOT NULL AND embeddings_binary IS NULL "
+            "ORDER BY id LIMIT :limit"),
+        {"last_id": last_id, "limit": EMBEDDING_MIGRATION_BATCH_SIZE}).all()
+    if not rows:
+        return None
+    connection.execute(
+        text("UPDATE document_chunks SET embeddings_binary = :value WHERE id = :id"),
+        [
+            {"id": row.id,
+             "value": np.asarray(
+                 json.loads(row.embeddings) if isinstance(row.embeddings, str) else row.embeddings,
+                 dtype=dtype).tobytes()}
+            for row in rows
+        ])
+    return rows[-1].id, len(rows)
+
+def backfill(engine: Engine) -> None:
+    #--- runs before upgrade(), outside the migration transaction: every batch
+    #--- commits on its own, so locks and WAL stay bounded and an interrupted
+    #--- run resumes with the rows whose embeddings_binary is still NULL
+    with engine.begin() as connection:
+        if not needs_conversion(connection):
+            return
+        add_binary_column(connection)
+        if not column_exists(connection, "document_chunks", "embeddings"):
+            return
+    last_id = 0
+    converted = 0
+    while True:
+        with engine.begin() as connection:
+            batch = convert_batch(connection, last_id)
+        if batch is None:
+            break
+        last_id, batch_size = batch
+        converted += batch_size
+        print(f"[migrations]\tConverted {converted} chunk embeddings...")
+
+def upgrade(connection: Connection) -> None:
+    #--- swaps the columns in the migration transaction; rows written after the
+    #--- backfill (or all rows, when run without it) are converted here
+    if not needs_conversion(connection):
+        return
+    add_binary_column(connection)
+    if column_exists(connection, "document_chunks", "embeddings"):
+        batch = convert_batch(connection, 0)
+        while batch is not None:
+            batch = convert_batch(connection, batch[0])
+        connection.execute(text("ALTER TABLE document_chunks DROP COLUMN embeddings"))
+    connection.execute(
+        text("ALTER TABLE document_chunks RENAME COLUMN embeddings_binary TO embeddings"))
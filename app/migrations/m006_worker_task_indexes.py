@@ -0,0 +1,13 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+def upgrade(connection: Connection) -> None:
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_worker_tasks_queued "
+        "ON worker_tasks (task_type, id) WHERE status = 'QUEUED'"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_worker_tasks_task_type_status "
+        "ON worker_tasks (task_type, status)"))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_worker_tasks_status_finshed_at "
+        "ON worker_tasks (status, finshed_at)"))
@@ -0,0 +1,45 @@
+import pkgutil
+import importlib
+from sqlalchemy import text
+
+import app.models  # noqa: F401
+from app import migrations
+from app.database import Base, engine
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+def get_migration_names() -> list[str]:
+    return sorted(
+        module.name for module in pkgutil.iter_modules(migrations.__path__)
+        if module.name.startswith("m") and module.name[1:4].isdigit())
+
+def get_applied_migrations() -> set[str]:
+    with engine.begin() as connection:
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "name VARCHAR PRIMARY KEY, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"))
+        rows = connection.execute(text(f"SELECT name FROM {MIGRATIONS_TABLE}"))
+        return {row[0] for row in rows}
+
+def main() -> None:
+    #--- new tables come from the models, migrations only patch existing ones
+    Base.metadata.create_all(bind=engine)
+    applied = get_applied_migrations()
+    for name in get_migration_names():
+        if name in applied:
+            continue
+        print(f"[migrations]\tApplying {name}...")
+        module = importlib.import_module(f"{migrations.__name__}.{name}")
+        #--- optional: long data rewrites that commit per batch before upgrade()
+        if hasattr(module, "backfill"):
+            module.backfill(engine)
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            connection.execute(
+                text(f"INSERT INTO {MIGRATIONS_TABLE} (name) VALUES (:name)"),
+                {"name": name})
+    print("[migrations]\tDatabase is up to date.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+def table_exists(connection: Connection, table_name: str) -> bool:
+    return inspect(connection).has_table(table_name)
+
+def column_exists(
+        connection: Connection, 
+        table_name: str, 
+        column_name: str) -> bool:
+    columns = inspect(connection).get_columns(table_name)
+    return column_name in [column["name"] for column in columns]
+
+def add_column_if_missing(
+        connection: Connection, 
+        table_name: str, 
+        column_name: str, 
+        column_type: str) -> None:
+    if not table_exists(connection, table_name):
+        return
+    if column_exists(connection, table_name, column_name):
+        return
+    connection.execute(
+        text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
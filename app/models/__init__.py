@@ -3,6 +3,7 @@ from .document import Document
 from .document_metadata import DocumentMetadata
 from .document_chunk import DocumentChunk
 from .worker_task import WorkerTask
+from .worker_task_history import WorkerTaskHistory
 
 __all__ = [
     "User",
@@ -10,4 +11,5 @@ __all__ = [
     "DocumentMetadata",
     "DocumentChunk",
     "WorkerTask",
+    "WorkerTaskHistory",
 ]
\ No newline at end of file
@@ -1,17 +1,22 @@
 from datetime import datetime
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 
 from app.database import Base
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_user_id_content_hash", "user_id", "content_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=True)
     uploaded_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
+    content_hash = Column(String(64), nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="documents")
     processed_document_metadata = relationship("DocumentMetadata", 
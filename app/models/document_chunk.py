@@ -1,17 +1,22 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, ForeignKey, JSON, Text, Index
 
 from app.database import Base
+from app.models.types import EmbeddingVector
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
+    __table_args__ = (
+        Index("ix_document_chunks_document_id_index", "document_id", "index"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     document_id = Column(Integer, ForeignKey("documents.id"))
     index = Column(Integer, nullable=False)
     text = Column(Text, nullable=False)
     tokens = Column(Integer, nullable=False)
-    embeddings = Column(JSON, nullable=True)
+    start_token = Column(Integer, nullable=True)
+    embeddings = Column(EmbeddingVector(), nullable=True)
     ner_entities = Column(JSON, nullable=True)
     topic_keywords = Column(JSON, nullable=True)
 
@@ -0,0 +1,30 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+load_dotenv(override=True)
+
+#--- float32 keeps the vectors exact, float16 halves the size again
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+
+class EmbeddingVector(TypeDecorator):
+    #--- raw little-endian bytes (BYTEA / BLOB) instead of a JSON float list,
+    #--- loaded back with np.frombuffer, i.e. without parsing or copying
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dtype: str = EMBEDDING_STORAGE_DTYPE, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+
+    def process_bind_param(self, value, dialect) -> bytes | None:
+        if value is None:
+            return None
+        return np.asarray(value, dtype=self.dtype).tobytes()
+
+    def process_result_value(self, value, dialect) -> np.ndarray | None:
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=self.dtype)
@@ -1,17 +1,29 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, text
 
 from app.database import Base
 from app.core.enum.worker_task_status import WorkerTaskStatus
 
 class WorkerTask(Base):
     __tablename__="worker_tasks"
+    __table_args__ = (
+        #--- claim: queued rows of one type in id order, only the queue is indexed
+        Index(
+            "ix_worker_tasks_queued",
+            "task_type",
+            "id",
+            postgresql_where=text("status = 'QUEUED'"),
+            sqlite_where=text("status = 'QUEUED'")),
+        #--- retention and status queries
+        Index("ix_worker_tasks_task_type_status", "task_type", "status"),
+        Index("ix_worker_tasks_status_finshed_at", "status", "finshed_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     payload = Column(JSON) 
     task_type = Column(String, nullable=False)
     status = Column(String, insert_default=WorkerTaskStatus.QUEUED)
-    started_at = Column(DateTime, insert_default=datetime.utcnow())
+    started_at = Column(DateTime, insert_default=datetime.utcnow)
     finshed_at = Column(DateTime, nullable=True)
-
-    
\ No newline at end of file
+    worker_id = Column(String, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+
+from app.database import Base
+
+class WorkerTaskHistory(Base):
+    __tablename__="worker_task_history"
+
+    id = Column(Integer, primary_key=True)
+    payload = Column(JSON) 
+    task_type = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finshed_at = Column(DateTime, nullable=True)
+    worker_id = Column(String, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, insert_default=datetime.utcnow, index=True)
@@ -3,8 +3,9 @@ from datetime import timedelta
 from sqlalchemy.orm import Session
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
+from jose import ExpiredSignatureError, JWTError
 
-from app.models import user
 from app import schemas, database
 from app.services import user_service
 from app.auth import create_access_token, decode_token
@@ -15,22 +16,22 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 @router.post("/register", 
              response_model=schemas.user.UserOut, 
              status_code=status.HTTP_201_CREATED)
-def register(
+async def register(
     user_in: schemas.user.UserCreate, 
     db: Session = Depends(database.get_database_session)):
-    existing = user_service.get_user_by_email(db, user_in.email)
+    existing = await run_in_threadpool(user_service.get_user_by_email, db, user_in.email)
     if existing:
         raise HTTPException(
             status_code=400, 
             detail="Email already registered")
-    user = user_service.create_user(db, user_in)
+    user = await user_service.create_user(db, user_in)
     return user
 
 @router.post("/login", response_model=schemas.user.Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
     db: Session = Depends(database.get_database_session)):
-    user = user_service.authenticate_user(
+    user = await user_service.authenticate_user(
         db, 
         form_data.username, 
         form_data.password)
@@ -48,8 +49,8 @@ def login_for_access_token(
 
 def get_current_user(
         token: str = Depends(oauth2_scheme), 
-        db: Session = Depends(database.get_database_session)) -> user.User:
-    from jwt import ExpiredSignatureError, PyJWTError
+        db: Session = Depends(database.get_database_session)) -> user_service.UserProjection:
+    #--- cached claims and user projection: the database is only hit on a miss
     try:
         payload = decode_token(token)
         email: str = payload.get("sub")
@@ -61,12 +62,12 @@ def get_current_user(
         raise HTTPException(
             status_code=401, 
             detail=f"Token expired:\n {ese}")
-    except PyJWTError as e:
+    except JWTError as e:
         raise HTTPException(
             status_code=401, 
             detail=f"Could not validate credentials: {e}")
     
-    user = user_service.get_user_by_email(db, email)
+    user = user_service.get_user_projection_by_email(db, email)
     if user is None:
         raise HTTPException(
             status_code=404, 
@@ -74,5 +75,5 @@ def get_current_user(
     return user
 
 @router.get("/my-profile", response_model=schemas.user.UserOut)
-def read_user_me(current_user: user.User = Depends(get_current_user)):
+def read_user_me(current_user: user_service.UserProjection = Depends(get_current_user)):
     return current_user
\ No newline at end of file
@@ -2,12 +2,14 @@ import os
 from uuid import uuid4
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from fastapi import (
     APIRouter, UploadFile, File, Depends, HTTPException)
 
 from app import database
 from .auth import get_current_user
-from app.models import user, worker_task
+from app.models import worker_task
+from app.services.user_service import UserProjection
 from app.services import document_service, task_service
 from app.core.enum.worker_task_type import WorkerTaskType
 
@@ -21,28 +23,50 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 @router.post("/upsert-file")
 async def upload_file(
     file: UploadFile = File(...),
+    force_reprocess: bool = False,
     db: Session = Depends(database.get_database_session), 
-    current_user: user.User = Depends(get_current_user)):
+    current_user: UserProjection = Depends(get_current_user)):
     unique_name = f"{uuid4()}_{file.filename}"
     file_path = os.path.join(UPLOAD_DIR, unique_name)
 
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    content_hash, _ = await document_service.write_document_locally(file, file_path)
 
-    document = document_service.create_document(
+    #--- same file already processed for this user: reuse its chunks and vectors
+    if not force_reprocess:
+        existing_document = await run_in_threadpool(
+            document_service.get_processed_document_by_hash,
+            db, current_user.id, content_hash)
+        if existing_document:
+            await run_in_threadpool(os.remove, file_path)
+            return {
+                "message": "Document already processed, linked to the existing document",
+                "document": existing_document,
+                "worker_task": None,
+                "deduplicated": True
+            }
+
+    #--- session work runs in the threadpool, never on the event loop
+    document = await run_in_threadpool(
+        document_service.create_document,
         db, 
         current_user.id, 
-        filename=file.filename, file_path=file_path)
+        filename=file.filename, 
+        file_path=file_path,
+        content_hash=content_hash)
 
     document_processing_task = worker_task.WorkerTask(
         payload={"document_id": document.id},
         task_type=WorkerTaskType.DOCUMENT_PROCESSING)
-    task_service.save_worker_task(db, document_processing_task)
+    await run_in_threadpool(task_service.save_worker_task, db, document_processing_task)
+    #--- the task commit expired the document, reload it here rather than
+    #--- lazily during response serialization on the loop
+    await run_in_threadpool(db.refresh, document)
     if document:
         return{
             "message": "Document uploaded successfully",
             "document": document,
-            "worker_task": document_processing_task
+            "worker_task": document_processing_task,
+            "deduplicated": False
         }
     else:
         return {"message": "An error occured while uploading the file!"}
@@ -50,7 +74,7 @@ async def upload_file(
 @router.get("/get-document/{document-id}")
 def get_document_by_id(
     id: int,
-    current_user: user.User = Depends(get_current_user),
+    current_user: UserProjection = Depends(get_current_user),
     db: Session = Depends(database.get_database_session)):
     file = document_service.get_document_by_id(db, id)
     if file:
@@ -64,7 +88,7 @@ def get_document_by_id(
 def delete_file(
     id: int,
     db: Session = Depends(database.get_database_session),
-    current_user: user.User = Depends(get_current_user)):
+    current_user: UserProjection = Depends(get_current_user)):
     success = document_service.delete_document_by_id(db, id)
     if success:
         return {
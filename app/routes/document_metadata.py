@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from app.models import user
+from app.services.user_service import UserProjection
 from app.database import get_database_session
 from app.routes.auth import get_current_user
 from app.services import document_metadata_service
@@ -12,7 +12,7 @@ router = APIRouter(prefix="/process-document", tags=["Document-Metadata"])
 def get_document_metadata(
     id: int, 
     db: Session = Depends(get_database_session), 
-    current_user: user.User = Depends(get_current_user)):
+    current_user: UserProjection = Depends(get_current_user)):
     document_metadata = document_metadata_service.get_document_metadata_by_document_id(db, id)
     if document_metadata:
         return {"Processed document metadata": document_metadata}
@@ -2,7 +2,7 @@ from typing import Any
 from sqlalchemy.orm import Session
 from fastapi import APIRouter, Depends
 
-from app.models.user import User
+from app.services.user_service import UserProjection
 from app.services import task_service
 from app.routes.auth import get_current_user
 from app.database import get_database_session
@@ -16,7 +16,7 @@ router = APIRouter(prefix="/nlp", tags=["NLP"])
 def run_ner(
     document_id: int, 
     db: Session = Depends(get_database_session), 
-    current_user: User = Depends(get_current_user)) -> dict[str, Any]:
+    current_user: UserProjection = Depends(get_current_user)) -> dict[str, Any]:
     ner_task = WorkerTask(payload={"document_id": document_id}, task_type=WorkerTaskType.ENTITY_EXTRACTION)
     task_service.save_worker_task(db, ner_task)
     return {"ner_task": WorkerTaskSchema.model_validate(ner_task)}
@@ -25,7 +25,7 @@ def run_ner(
 def get_task_by_id(
     task_id: int, 
     db: Session = Depends(get_database_session), 
-    current_user: User = Depends(get_current_user)) -> dict[str, Any]:
+    current_user: UserProjection = Depends(get_current_user)) -> dict[str, Any]:
     worker_task = task_service.get_task_by_id(db, task_id)
     return {
         "worker_task": WorkerTaskSchema.model_validate(worker_task)}
@@ -34,7 +34,7 @@ def get_task_by_id(
 def summarization_endpoint(
     document_id: int, 
     db: Session = Depends(get_database_session), 
-    current_user: User = Depends(get_current_user)) -> dict[str, Any]:
+    current_user: UserProjection = Depends(get_current_user)) -> dict[str, Any]:
     summarization_task = WorkerTask(
         payload={
                 "document_id": document_id,
@@ -0,0 +1,22 @@
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, Query
+
+from app.services.user_service import UserProjection
+from app.services import search_service
+from app.routes.auth import get_current_user
+from app.schemas.search import SearchResponse
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+@router.get("", response_model=SearchResponse)
+def search_documents(
+    query: str = Query(..., min_length=1),
+    document_id: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: UserProjection = Depends(get_current_user)) -> dict[str, Any]:
+    results = search_service.search_document_chunks(
+        current_user.id, 
+        query, 
+        document_id=document_id, 
+        limit=limit)
+    return {"query": query, "results": results}
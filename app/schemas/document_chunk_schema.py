@@ -1,5 +1,5 @@
 from typing import List
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
 class DocumentChunkSchema(BaseModel):
     id: int 
@@ -10,4 +10,9 @@ class DocumentChunkSchema(BaseModel):
     tokens: int
     embeddings: List[float]
 
+    @field_validator("embeddings", mode="before")
+    @classmethod
+    def embeddings_to_list(cls, value):
+        return value.tolist() if hasattr(value, "tolist") else value
+
     model_config = {"from_attributes": True}
\ No newline at end of file
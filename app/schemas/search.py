@@ -0,0 +1,13 @@
+from typing import Optional
+from pydantic import BaseModel
+
+class SearchResult(BaseModel):
+    chunk_id: Optional[int] = None
+    document_id: int
+    chunk_index: int
+    text: str
+    score: float
+
+class SearchResponse(BaseModel):
+    query: str
+    results: list[SearchResult]
@@ -10,4 +10,6 @@ class WorkerTaskSchema(BaseModel):
     task_type: str
     status: str
     started_at: datetime
-    finshed_at: Optional[datetime] = None
\ No newline at end of file
+    finshed_at: Optional[datetime] = None
+    worker_id: Optional[str] = None
+    claimed_at: Optional[datetime] = None
\ No newline at end of file
@@ -0,0 +1,111 @@
+import os
+import numpy as np
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.vector_database.qdrant_client import DocumindQdrantClient
+
+load_dotenv(override=True)
+
+CHUNK_READER_CACHE_SIZE = int(os.getenv("CHUNK_READER_CACHE_SIZE", "16"))
+CHUNK_READER_CACHE_TTL_SECONDS = float(os.getenv("CHUNK_READER_CACHE_TTL_SECONDS", "600"))
+
+#--- per process: repeat reads of the same document inside one worker process
+#--- (retries, re-queued tasks) skip the database and Qdrant
+chunk_cache = TTLCache(CHUNK_READER_CACHE_SIZE, ttl=CHUNK_READER_CACHE_TTL_SECONDS)
+
+@dataclass
+class OrderedChunks:
+    document_id: int
+    source: str
+    chunk_ids: list[int | None]
+    indexes: list[int]
+    texts: list[str]
+    start_tokens: list[int | None]
+    embeddings: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+def read_chunks_from_postgres(
+        db: Session,
+        document_id: int,
+        with_vectors: bool = False) -> OrderedChunks | None:
+    #--- range scan on ix_document_chunks_document_id_index, only the needed columns
+    columns = [DocumentChunk.id, DocumentChunk.index, DocumentChunk.text, DocumentChunk.start_token]
+    if with_vectors:
+        columns.append(DocumentChunk.embeddings)
+    rows = db.execute(
+        select(*columns)
+        .where(DocumentChunk.document_id == document_id)
+        .order_by(DocumentChunk.index)).all()
+    if not rows:
+        return None
+    embeddings = None
+    if with_vectors:
+        if any(row.embeddings is None for row in rows):
+            return None
+        embeddings = np.stack([row.embeddings for row in rows]).astype(np.float32, copy=False)
+    return OrderedChunks(
+        document_id=document_id,
+        source="postgres",
+        chunk_ids=[row.id for row in rows],
+        indexes=[row.index for row in rows],
+        texts=[row.text for row in rows],
+        start_tokens=[row.start_token for row in rows],
+        embeddings=embeddings)
+
+def read_chunks_from_qdrant(
+        user_id: int,
+        document_id: int,
+        with_vectors: bool = False) -> OrderedChunks | None:
+    points = DocumindQdrantClient(user_id=user_id).scroll_document_chunks(
+        document_id,
+        with_vectors=with_vectors)
+    if not points:
+        return None
+    return OrderedChunks(
+        document_id=document_id,
+        source="qdrant",
+        chunk_ids=[point.payload.get("chunk_id") for point in points],
+        indexes=[point.payload["chunk_index"] for point in points],
+        texts=[point.payload.get("text", "") for point in points],
+        start_tokens=[None] * len(points),
+        embeddings=np.asarray([point.vector for point in points], dtype=np.float32)
+        if with_vectors else None)
+
+def get_ordered_chunks(
+        db: Session,
+        document_id: int,
+        user_id: int | None = None,
+        with_vectors: bool = False) -> OrderedChunks:
+    #--- Postgres first, Qdrant (ordered server-side on chunk_index) as fallback
+    ordered_chunks = chunk_cache.get((document_id, True))
+    if ordered_chunks is None and not with_vectors:
+        ordered_chunks = chunk_cache.get((document_id, False))
+    if ordered_chunks is not None:
+        return ordered_chunks
+
+    ordered_chunks = read_chunks_from_postgres(db, document_id, with_vectors)
+    if ordered_chunks is None:
+        if user_id is None:
+            user_id = db.execute(
+                select(Document.user_id).where(Document.id == document_id)).scalar()
+        if user_id is not None:
+            ordered_chunks = read_chunks_from_qdrant(user_id, document_id, with_vectors)
+    if ordered_chunks is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No document chunks for document with id: {document_id}")
+    chunk_cache.set((document_id, with_vectors), ordered_chunks)
+    return ordered_chunks
+
+def invalidate_ordered_chunks(document_id: int) -> None:
+    chunk_cache.pop((document_id, True))
+    chunk_cache.pop((document_id, False))
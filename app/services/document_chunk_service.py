@@ -1,13 +1,18 @@
+from itertools import batched
 from fastapi import HTTPException
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 
 from app.models.document_chunk import DocumentChunk
 
+CHUNK_INSERT_BATCH_SIZE = 1000
+
 def get_chunks_by_document_id(
         db: Session, 
         document_id: int) -> list[DocumentChunk]:
     document_chunks = db.query(DocumentChunk) \
-    .filter(DocumentChunk.document_id==document_id).all()
+    .filter(DocumentChunk.document_id==document_id) \
+    .order_by(DocumentChunk.index).all()
     if not document_chunks:
         raise HTTPException(
             status_code=404, 
@@ -31,4 +36,42 @@ def update_document_chunk(
                 db.rollback()
                 raise AttributeError(f"Document object has no attribut named:{key}")
     except RuntimeError:
-        print("An error occured while updating DocumentChunk object")
\ No newline at end of file
+        print("An error occured while updating DocumentChunk object")
+
+def bulk_update_document_chunks(
+        db: Session,
+        rows: list[dict[str, any]]) -> None:
+    #--- rows are {"id": ..., <column>: <value>}, sent as one executemany UPDATE
+    if not rows:
+        return
+    try:
+        db.execute(update(DocumentChunk), rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise RuntimeError(f"An error occured while updating DocumentChunk objects:\n{e}")
+
+def bulk_insert_document_chunks(
+        db: Session,
+        rows: list[dict[str, any]],
+        batch_size: int = CHUNK_INSERT_BATCH_SIZE) -> list[int]:
+    #--- multi-row INSERT ... RETURNING id (insertmanyvalues), ids come back in
+    #--- the order of rows. Drivers without ordered RETURNING use the ORM.
+    if not rows:
+        return []
+    try:
+        if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+            statement = insert(DocumentChunk).returning(DocumentChunk.id, sort_by_parameter_order=True)
+            ids = []
+            for batch in batched(rows, batch_size):
+                ids.extend(db.scalars(statement, list(batch)).all())
+        else:
+            document_chunks = [DocumentChunk(**row) for row in rows]
+            db.add_all(document_chunks)
+            db.flush()
+            ids = [document_chunk.id for document_chunk in document_chunks]
+        db.commit()
+        return ids
+    except Exception as e:
+        db.rollback()
+        raise RuntimeError(f"An error occured while inserting DocumentChunk objects:\n{e}")
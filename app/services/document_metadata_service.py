@@ -1,8 +1,6 @@
-import os
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
-from app.workers.ner_worker.ner_worker import NERWorker
 from app.models.document_metadata import DocumentMetadata
 
 def get_document_metadata_by_document_id(
@@ -22,6 +20,17 @@ def save_document_metadata_object(
     db.refresh(document_metadata)
     return document_metadata
 
+def get_or_create_document_metadata(
+        db: Session, 
+        document_id: int) -> DocumentMetadata:
+    document_metadata = db.query(DocumentMetadata) \
+    .filter(DocumentMetadata.document_id == document_id).first()
+    if document_metadata:
+        return document_metadata
+    return save_document_metadata_object(
+        db, 
+        DocumentMetadata(document_id=document_id))
+
 def update_document_metadata(
         db: Session,
         document_id: int,
@@ -44,14 +53,6 @@ def update_document_metadata(
         raise RuntimeError(f"Error occured while updating the document metadata object:\n{e}")
 
 def get_named_entities(db: Session, document_id: int):
+    #--- entities are extracted by the NER worker, the API never loads the model
     document_metadata = get_document_metadata_by_document_id(db, document_id)
-    if document_metadata.entities:
-        return document_metadata.entities
-    current_dir = os.path.dirname(__file__)
-    model_path = os.path.join(current_dir, "..", "core", "onnx", "xlm_roberta_ner.onnx")
-    model_path = os.path.abspath(model_path)
-    ner_worker = NERWorker(model_path)
-    entities = ner_worker.extract_entities(document_metadata.clean_text)
-    # update_document_metadata(db, document_id, {"entities": entities})
-    return entities
-        
\ No newline at end of file
+    return document_metadata.global_entities or []
@@ -1,5 +1,9 @@
 import os 
+import hashlib
+from dotenv import load_dotenv
+from datetime import datetime, timezone
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session 
 
 # from app.workers import document_worker
@@ -7,16 +11,52 @@ from app.models.document import Document
 # from app.services import document_metadata_service
 # from app.models.document_metadata import DocumentMetadata
 
+load_dotenv(override=True)
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+def _write_upload_chunk(buffer, content_hash, contents: bytes) -> None:
+    #--- hashlib releases the GIL on large buffers, so this runs off the event loop
+    content_hash.update(contents)
+    buffer.write(contents)
+
+def _discard_partial_file(buffer, temp_path: str) -> None:
+    buffer.close()
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
 async def write_document_locally(
         file, 
-        file_path: str) -> None:
+        file_path: str,
+        max_bytes: int = MAX_UPLOAD_BYTES) -> tuple[str, int]:
+    #--- streams the upload to disk in UPLOAD_CHUNK_SIZE pieces and returns
+    #--- (sha256, size). The file only appears under file_path once complete.
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File exceeds the maximum upload size of {max_bytes} bytes")
+    temp_path = f"{file_path}.part"
+    await run_in_threadpool(os.makedirs, os.path.dirname(file_path), exist_ok=True)
+    buffer = await run_in_threadpool(open, temp_path, "wb")
+    content_hash = hashlib.sha256()
+    size = 0
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        contents = await file.read()
-        with open(file_path, "wb") as buffer:
-            buffer.write(contents)
-
+        while contents := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(contents)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File exceeds the maximum upload size of {max_bytes} bytes")
+            await run_in_threadpool(_write_upload_chunk, buffer, content_hash, contents)
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(os.replace, temp_path, file_path)
+        return content_hash.hexdigest(), size
+    except HTTPException:
+        await run_in_threadpool(_discard_partial_file, buffer, temp_path)
+        raise
     except Exception as e:
+        await run_in_threadpool(_discard_partial_file, buffer, temp_path)
         raise HTTPException(
             status_code=500,
             detail=f"Error writing file: {e}"
@@ -26,11 +66,13 @@ def create_document(
         db: Session, 
         user_id: int, 
         filename: str, 
-        file_path: str) -> Document:
+        file_path: str,
+        content_hash: str | None = None) -> Document:
     doc = Document(
         user_id=user_id, 
         filename=filename, 
-        file_path=file_path)
+        file_path=file_path,
+        content_hash=content_hash)
     db.add(doc)
     db.commit()
     db.refresh(doc)
@@ -46,6 +88,23 @@ def get_document_by_id(
             detail=f"Document with id: {id}, not found!")
     return document
 
+def get_processed_document_by_hash(
+        db: Session, 
+        user_id: int, 
+        content_hash: str) -> Document | None:
+    return db.query(Document) \
+    .filter(Document.user_id == user_id) \
+    .filter(Document.content_hash == content_hash) \
+    .filter(Document.processed_at.isnot(None)) \
+    .order_by(Document.id.desc()).first()
+
+def mark_document_processed(db: Session, document: Document) -> Document:
+    document.processed_at = datetime.now(timezone.utc)
+    db.add(document)
+    db.commit()
+    db.refresh(document)
+    return document
+
 def delete_document_by_id(db: Session, id: int) -> bool:
     doc = get_document_by_id(db, id)
     if not doc:
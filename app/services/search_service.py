@@ -0,0 +1,56 @@
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+from app.core.cache import TTLCache
+from app.core.model_registry import model_registry
+
+load_dotenv(override=True)
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+QUERY_VECTOR_CACHE_TTL_SECONDS = float(os.getenv("QUERY_VECTOR_CACHE_TTL_SECONDS", "3600"))
+SEARCH_RESULT_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_RESULT_CACHE_TTL_SECONDS", "60"))
+
+query_vector_cache = TTLCache(SEARCH_CACHE_SIZE, ttl=QUERY_VECTOR_CACHE_TTL_SECONDS)
+search_result_cache = TTLCache(SEARCH_CACHE_SIZE, ttl=SEARCH_RESULT_CACHE_TTL_SECONDS)
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+def embed_query(query: str) -> np.ndarray:
+    query = normalize_query(query)
+    query_vector = query_vector_cache.get(query)
+    if query_vector is None:
+        query_vector = model_registry.get("embedding").encode(
+            query, 
+            convert_to_numpy=True, 
+            show_progress_bar=False).astype(np.float32)
+        query_vector_cache.set(query, query_vector)
+    return query_vector
+
+def search_document_chunks(
+        user_id: int,
+        query: str,
+        document_id: int | None = None,
+        limit: int = 10) -> list[dict]:
+    #--- results are cached shortly, so newly indexed chunks show up within the TTL
+    result_key = (user_id, document_id, limit, normalize_query(query))
+    results = search_result_cache.get(result_key)
+    if results is not None:
+        return results
+    #--- imported on first search, qdrant_client alone takes ~1s to import
+    from app.vector_database.qdrant_client import DocumindQdrantClient
+    qdrant_client = DocumindQdrantClient(user_id)
+    points = qdrant_client.search_chunks(embed_query(query), document_id, limit)
+    results = [
+        {
+            "chunk_id": point.payload.get("chunk_id"),
+            "document_id": point.payload.get("document_id"),
+            "chunk_index": point.payload.get("chunk_index"),
+            "text": point.payload.get("text", ""),
+            "score": point.score
+        }
+        for point in points
+    ]
+    search_result_cache.set(result_key, results)
+    return results
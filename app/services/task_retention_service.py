@@ -0,0 +1,98 @@
+import os
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import select, insert, delete, func, or_, and_
+from sqlalchemy.orm import Session
+
+from app.models.worker_task import WorkerTask
+from app.models.worker_task_history import WorkerTaskHistory
+from app.core.enum.worker_task_status import WorkerTaskStatus
+
+load_dotenv(override=True)
+
+#--- seconds a task is kept after it finished, 0 or less keeps it forever
+TASK_RETENTION_FINISHED_SECONDS = int(os.getenv("TASK_RETENTION_FINISHED_SECONDS", str(24 * 3600)))
+TASK_RETENTION_FAILED_SECONDS = int(os.getenv("TASK_RETENTION_FAILED_SECONDS", str(7 * 24 * 3600)))
+TASK_RETENTION_BATCH_SIZE = int(os.getenv("TASK_RETENTION_BATCH_SIZE", "1000"))
+TASK_RETENTION_ARCHIVE = os.getenv("TASK_RETENTION_ARCHIVE", "false").lower() == "true"
+TASK_RETENTION_INTERVAL_SECONDS = int(os.getenv("TASK_RETENTION_INTERVAL_SECONDS", "3600"))
+
+ARCHIVED_COLUMNS = [
+    "id", "payload", "task_type", "status", "started_at",
+    "finshed_at", "worker_id", "claimed_at"
+]
+
+def get_retention_policies() -> dict[WorkerTaskStatus, int]:
+    return {
+        WorkerTaskStatus.FINISHED: TASK_RETENTION_FINISHED_SECONDS,
+        WorkerTaskStatus.FAILED: TASK_RETENTION_FAILED_SECONDS,
+    }
+
+def archive_tasks(db: Session, task_ids: list[int]) -> None:
+    #--- INSERT ... SELECT, rows never leave the database
+    columns = [getattr(WorkerTask, column) for column in ARCHIVED_COLUMNS]
+    db.execute(
+        insert(WorkerTaskHistory).from_select(
+            ARCHIVED_COLUMNS,
+            select(*columns).where(WorkerTask.id.in_(task_ids))))
+
+def delete_expired_tasks(
+        db: Session,
+        status: WorkerTaskStatus,
+        older_than: datetime,
+        task_type: str | None = None,
+        batch_size: int = TASK_RETENTION_BATCH_SIZE,
+        archive: bool = TASK_RETENTION_ARCHIVE) -> int:
+    #--- set-based DELETE of at most batch_size rows per transaction, so locks
+    #--- and WAL stay bounded however many tasks piled up
+    #--- tasks without finshed_at (crashed mid-way) age from when they were claimed
+    expired = or_(
+        WorkerTask.finshed_at < older_than,
+        and_(
+            WorkerTask.finshed_at.is_(None),
+            func.coalesce(WorkerTask.claimed_at, WorkerTask.started_at) < older_than))
+    expired_tasks = select(WorkerTask.id) \
+    .where(WorkerTask.status == status) \
+    .where(expired) \
+    .order_by(WorkerTask.id) \
+    .limit(batch_size)
+    if task_type is not None:
+        expired_tasks = expired_tasks.where(WorkerTask.task_type == task_type)
+    if db.get_bind().dialect.name == "postgresql":
+        expired_tasks = expired_tasks.with_for_update(skip_locked=True)
+
+    deleted = 0
+    while True:
+        try:
+            task_ids = db.scalars(expired_tasks).all()
+            if not task_ids:
+                db.commit()
+                return deleted
+            if archive:
+                archive_tasks(db, task_ids)
+            db.execute(
+                delete(WorkerTask).where(WorkerTask.id.in_(task_ids)),
+                execution_options={"synchronize_session": False})
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise RuntimeError(f"An error occured while deleting expired tasks: {e}")
+        deleted += len(task_ids)
+        if len(task_ids) < batch_size:
+            return deleted
+
+def run_task_retention(
+        db: Session,
+        task_type: str | None = None,
+        now: datetime | None = None) -> dict[WorkerTaskStatus, int]:
+    now = now or datetime.utcnow()
+    deleted = {}
+    for status, retention_seconds in get_retention_policies().items():
+        if retention_seconds <= 0:
+            continue
+        deleted[status] = delete_expired_tasks(
+            db,
+            status,
+            now - timedelta(seconds=retention_seconds),
+            task_type=task_type)
+    return deleted
@@ -1,14 +1,33 @@
+import os
+import socket
+from datetime import datetime
 from fastapi import HTTPException
+from sqlalchemy import select, update, text, func
 from sqlalchemy.orm import Session
 
 from app.models.worker_task import WorkerTask
+from app.core.enum.worker_task_type import WorkerTaskType
 from app.core.enum.worker_task_status import WorkerTaskStatus
 
+def get_task_channel(task_type: str) -> str:
+    return f"worker_tasks_{WorkerTaskType(task_type).value.lower()}"
+
+def notify_new_task(db: Session, worker_task: WorkerTask) -> None:
+    #--- NOTIFY is transactional, listeners are woken up on commit
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": get_task_channel(worker_task.task_type), 
+         "payload": str(worker_task.id)})
+
 def save_worker_task(
         db: Session, 
         worker_task: WorkerTask) -> WorkerTask | None:
     try:
         db.add(worker_task)
+        db.flush()
+        notify_new_task(db, worker_task)
         db.commit()
         db.refresh(worker_task)
         return worker_task
@@ -43,14 +62,42 @@ def update_worker_task(
             status_code=500, 
             detail=message)
     
-def get_new_task(db: Session, task_type: str) -> WorkerTask | None:
-    worker_task = db.query(WorkerTask) \
-    .filter(WorkerTask.task_type==task_type) \
-    .filter(WorkerTask.status==WorkerTaskStatus.QUEUED).first()
+def get_worker_id(pid: int | None = None) -> str:
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
 
-    if not worker_task:
-        return None
-    return worker_task
+def claim_tasks(
+        db: Session, 
+        task_type: str, 
+        limit: int = 1, 
+        worker_id: str | None = None) -> list[WorkerTask]:
+    #--- one UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING,
+    #--- so concurrent workers never claim the same row. SQLite has no row locks
+    #--- but serializes writers, so the same single statement is already atomic.
+    queued_tasks = select(WorkerTask.id) \
+    .where(WorkerTask.task_type == task_type) \
+    .where(WorkerTask.status == WorkerTaskStatus.QUEUED) \
+    .order_by(WorkerTask.id) \
+    .limit(limit)
+    if db.get_bind().dialect.name == "postgresql":
+        queued_tasks = queued_tasks.with_for_update(skip_locked=True)
+
+    claim_statement = update(WorkerTask) \
+    .where(WorkerTask.id.in_(queued_tasks.scalar_subquery())) \
+    .where(WorkerTask.status == WorkerTaskStatus.QUEUED) \
+    .values(
+        status=WorkerTaskStatus.PROCESSING,
+        worker_id=worker_id or get_worker_id(),
+        claimed_at=datetime.utcnow()) \
+    .returning(WorkerTask)
+    try:
+        claimed_tasks = db.scalars(claim_statement).all()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500, 
+            detail=f"An error occured while claiming tasks: {e}")
+    return sorted(claimed_tasks, key=lambda task: task.id)
 
 def get_worker_task_by_id(
         db: Session, 
@@ -75,7 +122,23 @@ def get_task_by_id(
         )
     return worker_task
 
-def get_finished_tasks(db: Session, task_type: str) -> list[WorkerTask]:
-    return db.query(WorkerTask) \
-    .filter(WorkerTask.task_type == task_type) \
-    .filter(WorkerTask.status == WorkerTaskStatus.FINISHED).all()
\ No newline at end of file
+def get_queue_stats(db: Session) -> dict[str, dict[str, float]]:
+    #--- one aggregate over the partial queued-tasks index, cheap enough to poll
+    rows = db.execute(
+        select(WorkerTask.task_type, func.count(WorkerTask.id), func.min(WorkerTask.started_at))
+        .where(WorkerTask.status == WorkerTaskStatus.QUEUED)
+        .group_by(WorkerTask.task_type)).all()
+    now = datetime.utcnow()
+    return {
+        task_type: {
+            "queued": count,
+            "oldest_age_seconds": (now - oldest).total_seconds() if oldest else 0.0
+        }
+        for task_type, count, oldest in rows
+    }
+
+def get_busy_worker_ids(db: Session) -> set[str]:
+    return set(db.scalars(
+        select(WorkerTask.worker_id)
+        .where(WorkerTask.status == WorkerTaskStatus.PROCESSING)
+        .where(WorkerTask.worker_id.is_not(None))).all())
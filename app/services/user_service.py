@@ -1,20 +1,53 @@
+import os
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from sqlalchemy import select
 from sqlalchemy.orm import Session 
+from starlette.concurrency import run_in_threadpool
 
+from app.core.cache import TTLCache
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.auth import get_password_hash, verify_password
+from app.auth import (
+    get_password_hash, 
+    verify_and_update_password, 
+    run_password_task
+)
 
-def create_user(
+load_dotenv(override=True)
+
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+#--- per API process: bounds how long a change made by another process stays unseen
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+
+@dataclass(frozen=True)
+class UserProjection:
+    #--- what authenticated routes need from a user, safe to share across sessions
+    id: int
+    email: str
+    full_name: str
+
+#--- email -> UserProjection, misses (unknown emails) are not cached
+user_cache = TTLCache(AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL_SECONDS)
+
+async def create_user(
         db: Session, 
         user_in: UserCreate) -> User:
-    hashed = get_password_hash(user_in.password)
+    hashed = await run_password_task(get_password_hash, user_in.password)
     db_user = User(
         email=user_in.email, 
         hashed_password=hashed, 
         full_name=user_in.full_name)
+    #--- session work stays off the event loop
+    return await run_in_threadpool(save_user, db, db_user)
+
+def save_user(
+        db: Session, 
+        db_user: User) -> User:
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    invalidate_cached_user(db_user.email)
     return db_user
 
 def get_user_by_email(
@@ -22,13 +55,40 @@ def get_user_by_email(
         email: str) -> User | None:
     return db.query(User).filter(User.email == email).first()
 
-def authenticate_user(
+def get_user_projection_by_email(
+        db: Session, 
+        email: str) -> UserProjection | None:
+    user_projection = user_cache.get(email)
+    if user_projection is not None:
+        return user_projection
+    row = db.execute(
+        select(User.id, User.email, User.full_name)
+        .where(User.email == email)).first()
+    if row is None:
+        return None
+    user_projection = UserProjection(id=row.id, email=row.email, full_name=row.full_name)
+    user_cache.set(email, user_projection)
+    return user_projection
+
+def invalidate_cached_user(email: str) -> None:
+    #--- call after any change to a user row
+    user_cache.pop(email)
+
+async def authenticate_user(
         db: Session, 
         username: str, 
         password: str) -> User | None:
-    user = get_user_by_email(db, username)
+    user = await run_in_threadpool(get_user_by_email, db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await run_password_task(
+        verify_and_update_password, 
+        password, 
+        user.hashed_password)
+    if not verified:
         return None
+    if new_hash is not None:
+        #--- Argon2 parameters changed since this hash was made
+        user.hashed_password = new_hash
+        user = await run_in_threadpool(save_user, db, user)
     return user
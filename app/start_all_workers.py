@@ -1,39 +1,212 @@
+import os
+import sys
+import math
+import signal
 import subprocess
-import platform
+from time import sleep, monotonic
+from dotenv import load_dotenv
 
-from app.workers.ner_worker import ner_worker_processor
-from app.workers.document_worker import document_worker_processor
-from app.workers.summarization_worker import summarization_worker_processor
+from app.database import get_session
+from app.services import task_service
+from app.core.enum.worker_task_type import WorkerTaskType
 
-def main():
-    print("Starting all workers...\n\n")
-    print("\tStarting NER Worker...")
-    ner_worker_processor.main()
-    print("\tStarting Document Worker...")
-    document_worker_processor.main()
-    print("\tStarting Summarization Worker...")
-    summarization_worker_processor.main()
+load_dotenv(override=True)
 
-if __name__ == "__main__":
-    main()
+SUPERVISOR_POLL_SECONDS = float(os.getenv("SUPERVISOR_POLL_SECONDS", "5"))
+#--- queued tasks one worker is expected to absorb before another one is started
+SUPERVISOR_TASKS_PER_WORKER = int(os.getenv("SUPERVISOR_TASKS_PER_WORKER", "4"))
+#--- a task waiting longer than this adds a worker even if the queue is short
+SUPERVISOR_MAX_QUEUE_AGE_SECONDS = float(os.getenv("SUPERVISOR_MAX_QUEUE_AGE_SECONDS", "30"))
+SUPERVISOR_SCALE_DOWN_IDLE_SECONDS = float(os.getenv("SUPERVISOR_SCALE_DOWN_IDLE_SECONDS", "60"))
+SUPERVISOR_STOP_TIMEOUT_SECONDS = float(os.getenv("SUPERVISOR_STOP_TIMEOUT_SECONDS", "30"))
+#--- restarts after a crash wait 1s, 2s, 4s, ... up to the max; a child that
+#--- ran longer than SUPERVISOR_HEALTHY_SECONDS resets the backoff
+SUPERVISOR_RESTART_BACKOFF_SECONDS = float(os.getenv("SUPERVISOR_RESTART_BACKOFF_SECONDS", "1"))
+SUPERVISOR_RESTART_BACKOFF_MAX_SECONDS = float(os.getenv("SUPERVISOR_RESTART_BACKOFF_MAX_SECONDS", "300"))
+SUPERVISOR_HEALTHY_SECONDS = float(os.getenv("SUPERVISOR_HEALTHY_SECONDS", "60"))
+#--- document workers per supervised process, forked from one parent that loaded
+#--- the embedding model once (copy-on-write). Every supervised process is a
+#--- separate model copy, so prefer raising this over DOCUMENT_MAX_WORKERS.
+DOCUMENT_WORKER_POOL_SIZE = int(os.getenv("DOCUMENT_WORKER_POOL_SIZE", "1"))
+
+def supervisor_print(text: str) -> None:
+    print("\033[96m {}\033[00m".format(f"[Supervisor] \t{text}"))
+
+def get_pool_limits(name: str, default_min: int, default_max: int) -> tuple[int, int]:
+    min_workers = int(os.getenv(f"{name}_MIN_WORKERS", str(default_min)))
+    max_workers = int(os.getenv(f"{name}_MAX_WORKERS", str(default_max)))
+    return min_workers, max(min_workers, max_workers)
+
+class WorkerPool:
+    def __init__(self,
+                 name: str,
+                 module: str,
+                 task_type: str | None,
+                 min_workers: int,
+                 max_workers: int,
+                 workers_per_process: int = 1,
+                 environment: dict[str, str] | None = None):
+        self.name = name
+        self.module = module
+        self.task_type = task_type
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.workers_per_process = workers_per_process
+        self.environment = environment or {}
+        self.processes: list[subprocess.Popen] = []
+        self.stopping: list[subprocess.Popen] = []
+        self.started_at: dict[int, float] = {}
+        self.last_demand = monotonic()
+        self.failures = 0
+        self.restart_after = 0.0
+
+    def start_process(self) -> None:
+        process = subprocess.Popen(
+            [sys.executable, "-m", self.module], 
+            env={**os.environ, **self.environment})
+        self.processes.append(process)
+        self.started_at[process.pid] = monotonic()
+        supervisor_print(f"Started {self.name} worker (pid: {process.pid}), {len(self.processes)} running")
 
+    def stop_process(self, process: subprocess.Popen) -> None:
+        #--- SIGINT: workers leave their loop through the KeyboardInterrupt path
+        process.send_signal(signal.SIGINT)
+        self.processes.remove(process)
+        self.stopping.append(process)
+        supervisor_print(f"Stopping {self.name} worker (pid: {process.pid}), {len(self.processes)} running")
 
-def open_worker_in_new_terminal(command):
-    system = platform.system()
-    if system == "Windows":
-        subprocess.Popen(["start", "cmd", "/k", command], shell=True)
-    elif system == "Linux":
-        subprocess.Popen(["gnome-terminal", "--", "bash", "-c", command])
-    elif system == "Darwin":  # macOS
-        subprocess.Popen(["osascript", "-e",
-                          f'tell app "Terminal" to do script "{command}"'])
-    else:
-        print(f"Unsupported OS: {system}")
+    def reap(self) -> None:
+        self.stopping = [process for process in self.stopping if process.poll() is None]
+        for process in list(self.processes):
+            if process.poll() is None:
+                continue
+            self.processes.remove(process)
+            started_at = self.started_at.pop(process.pid, monotonic())
+            if process.returncode == 0:
+                continue
+            if monotonic() - started_at >= SUPERVISOR_HEALTHY_SECONDS:
+                self.failures = 0
+            self.failures += 1
+            backoff = min(
+                SUPERVISOR_RESTART_BACKOFF_SECONDS * 2 ** (self.failures - 1),
+                SUPERVISOR_RESTART_BACKOFF_MAX_SECONDS)
+            self.restart_after = monotonic() + backoff
+            supervisor_print(
+                f"[error] {self.name} worker (pid: {process.pid}) exited with code {process.returncode}, "
+                f"restarting in {backoff:.0f}s")
+
+    def get_worker_ids(self, process: subprocess.Popen) -> set[str]:
+        #--- forked pool members claim tasks under their own pid
+        worker_ids = {task_service.get_worker_id(process.pid)}
+        try:
+            with open(f"/proc/{process.pid}/task/{process.pid}/children") as children:
+                worker_ids.update(task_service.get_worker_id(int(pid)) for pid in children.read().split())
+        except OSError:
+            pass
+        return worker_ids
+
+    def get_desired_size(self, queued: int, oldest_age_seconds: float) -> int:
+        if self.task_type is None:
+            return self.min_workers
+        desired = math.ceil(queued / (SUPERVISOR_TASKS_PER_WORKER * self.workers_per_process))
+        if queued and oldest_age_seconds > SUPERVISOR_MAX_QUEUE_AGE_SECONDS:
+            desired = max(desired, len(self.processes) + 1)
+        return min(max(desired, self.min_workers), self.max_workers)
+
+    def scale(self, desired: int, busy_worker_ids: set[str]) -> None:
+        #--- crashed children are replaced right away, scaling up is immediate,
+        #--- scaling down waits for an idle period and only stops idle children
+        if self.restart_after > monotonic():
+            return
+        while len(self.processes) < desired:
+            self.start_process()
+        if len(self.processes) <= desired:
+            self.last_demand = monotonic()
+            return
+        if monotonic() - self.last_demand < SUPERVISOR_SCALE_DOWN_IDLE_SECONDS:
+            return
+        for process in reversed(self.processes):
+            if not self.get_worker_ids(process) & busy_worker_ids:
+                self.stop_process(process)
+                self.last_demand = monotonic()
+                return
+
+    def stop(self) -> None:
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        deadline = monotonic() + SUPERVISOR_STOP_TIMEOUT_SECONDS
+        for process in self.processes + self.stopping:
+            try:
+                process.wait(timeout=max(0.0, deadline - monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes.clear()
+        self.stopping.clear()
+        self.started_at.clear()
+
+def create_worker_pools() -> list[WorkerPool]:
+    return [
+        WorkerPool(
+            "DOCUMENT",
+            "app.workers.document_worker.document_worker_processor",
+            WorkerTaskType.DOCUMENT_PROCESSING.value,
+            *get_pool_limits("DOCUMENT", 1, 2),
+            workers_per_process=DOCUMENT_WORKER_POOL_SIZE,
+            environment={"DOCUMENT_WORKER_POOL_SIZE": str(DOCUMENT_WORKER_POOL_SIZE)}),
+        WorkerPool(
+            "NER",
+            "app.workers.ner_worker.ner_worker_processor",
+            WorkerTaskType.ENTITY_EXTRACTION.value,
+            *get_pool_limits("NER", 1, 2)),
+        WorkerPool(
+            "SUMMARIZATION",
+            "app.workers.summarization_worker.summarization_worker_processor",
+            WorkerTaskType.SUMMARIZATION.value,
+            *get_pool_limits("SUMMARIZATION", 1, 2)),
+        WorkerPool(
+            "RETENTION",
+            "app.workers.retention_worker.retention_worker_processor",
+            None,
+            1,
+            1),
+    ]
+
+def supervise(worker_pools: list[WorkerPool]) -> None:
+    while True:
+        db = get_session()
+        try:
+            queue_stats = task_service.get_queue_stats(db)
+            busy_worker_ids = task_service.get_busy_worker_ids(db)
+        except Exception as e:
+            #--- keep the current pool sizes until the queue is readable again
+            supervisor_print(f"[error] Could not read the task queue: {e}")
+            queue_stats, busy_worker_ids = None, set()
+        finally:
+            db.close()
+        for worker_pool in worker_pools:
+            worker_pool.reap()
+            if queue_stats is None:
+                desired = max(worker_pool.min_workers, len(worker_pool.processes))
+            else:
+                stats = queue_stats.get(worker_pool.task_type, {})
+                desired = worker_pool.get_desired_size(
+                    stats.get("queued", 0),
+                    stats.get("oldest_age_seconds", 0.0))
+            worker_pool.scale(desired, busy_worker_ids)
+        sleep(SUPERVISOR_POLL_SECONDS)
 
 def main():
-    open_worker_in_new_terminal("python -m app.workers.ner_worker")
-    open_worker_in_new_terminal("python -m app.workers.document_worker")
-    open_worker_in_new_terminal("python -m app.workers.summarization_worker")
+    supervisor_print("Starting all workers...")
+    worker_pools = create_worker_pools()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        supervise(worker_pools)
+    except (KeyboardInterrupt, SystemExit):
+        supervisor_print("Stopping all workers...")
+        for worker_pool in worker_pools:
+            worker_pool.stop()
+        supervisor_print("All workers stopped.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,99 +1,197 @@
 import os 
+import uuid
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import (
-    VectorParams, Distance, PointStruct, Filter, 
-    FieldCondition, MatchValue, PayloadSchemaType
+    VectorParams, Distance, Batch, Filter, 
+    FieldCondition, MatchValue, PayloadSchemaType, ScoredPoint,
+    Record, OrderBy, Direction
 )
 
-from app.models.document_chunk import DocumentChunk
-
 load_dotenv(override=True)
 
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION = os.getenv("QDRANT_COLLECTION_NAME")
-VECTOR_SIZE = 100
-
-class DocumindQdrantClient:
-    def _ensure_indexes(self):
-        indexes = {
-            "user_id": PayloadSchemaType.INTEGER,
-            "document_id": PayloadSchemaType.INTEGER,
-            "chunk_index": PayloadSchemaType.INTEGER,
-        }
-
-        for field, schema in indexes.items():
-            try:
-                self.qdrant_client.create_payload_index(
-                    collection_name=COLLECTION,
-                    field_name=field,
-                    field_schema=schema
-                )
-            except Exception:
-                pass
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "30"))
+VECTOR_SIZE = 768
+QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
+QDRANT_UPSERT_PARALLEL = int(os.getenv("QDRANT_UPSERT_PARALLEL", "4"))
+QDRANT_UPSERT_WAIT = os.getenv("QDRANT_UPSERT_WAIT", "false").lower() == "true"
+#--- fixed namespace, point ids must stay stable across processes and deploys
+POINT_ID_NAMESPACE = uuid.UUID("6f1c7a52-3d9e-4b8a-9a43-2f6f0e1d8c55")
+PAYLOAD_INDEXES = {
+    "user_id": PayloadSchemaType.INTEGER,
+    "document_id": PayloadSchemaType.INTEGER,
+    "chunk_index": PayloadSchemaType.INTEGER,
+}
 
-    def __init__(self, user_id: int):
-        self.user_id = user_id
+_client_lock = threading.Lock()
+_shared_client: QdrantClient | None = None
+_shared_client_pid: int | None = None
 
-        self.qdrant_client = QdrantClient(
-            url=QDRANT_URL,
-            api_key=QDRANT_API_KEY
+def _ensure_collection(client: QdrantClient) -> None:
+    collections = client.get_collections().collections
+    if COLLECTION in [c.name for c in collections]:
+        return
+    try:
+        client.create_collection(
+            collection_name=COLLECTION,
+            vectors_config=VectorParams(
+                size=VECTOR_SIZE,
+                distance=Distance.COSINE
+            )
         )
+    except Exception:
+        #--- another process created it in the meantime
+        if not client.collection_exists(COLLECTION):
+            raise
 
-        collections = self.qdrant_client.get_collections().collections
-        if COLLECTION not in [c.name for c in collections]:
-            self.qdrant_client.create_collection(
+def _ensure_indexes(client: QdrantClient) -> None:
+    existing_indexes = client.get_collection(COLLECTION).payload_schema or {}
+    for field, schema in PAYLOAD_INDEXES.items():
+        if field in existing_indexes:
+            continue
+        try:
+            client.create_payload_index(
                 collection_name=COLLECTION,
-                vectors_config=VectorParams(
-                    size=768,
-                    distance=Distance.COSINE
-                )
+                field_name=field,
+                field_schema=schema
+            )
+        except Exception as e:
+            print(f"[Qdrant]\tCould not create payload index on {field}: {e}")
+
+def get_qdrant_client() -> QdrantClient:
+    #--- one client per process (re-created after fork), collection and payload
+    #--- indexes are bootstrapped only once. The client keeps its HTTP/gRPC
+    #--- connections alive, so every DocumindQdrantClient reuses them.
+    global _shared_client, _shared_client_pid
+    pid = os.getpid()
+    if _shared_client is not None and _shared_client_pid == pid:
+        return _shared_client
+    with _client_lock:
+        if _shared_client is None or _shared_client_pid != pid:
+            client = QdrantClient(
+                url=QDRANT_URL,
+                api_key=QDRANT_API_KEY,
+                prefer_grpc=QDRANT_PREFER_GRPC,
+                grpc_port=QDRANT_GRPC_PORT,
+                timeout=QDRANT_TIMEOUT
             )
-        self._ensure_indexes() 
+            _ensure_collection(client)
+            _ensure_indexes(client)
+            _shared_client = client
+            _shared_client_pid = pid
+    return _shared_client
+
+def get_point_id(document_id: int, chunk_index: int) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{document_id}:{chunk_index}"))
+
+class DocumindQdrantClient:
+    #--- cheap per-user view over the shared process-wide client
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.qdrant_client = get_qdrant_client()
     
     def __exit__(self, exc_type, exc_value, traceback):
         pass 
     
+    def _upsert_batch(
+            self,
+            embeddings: np.ndarray,
+            document_chunks: list[dict],
+            wait: bool) -> None:
+        self.qdrant_client.upsert(
+            collection_name=COLLECTION,
+            points=Batch(
+                ids=[get_point_id(chunk["document_id"], chunk["index"]) for chunk in document_chunks],
+                vectors=embeddings.tolist(),
+                payloads=[
+                    {
+                        "user_id": self.user_id,
+                        "document_id": chunk["document_id"],
+                        "chunk_id": chunk["id"],
+                        "chunk_index": chunk["index"],
+                        "text": chunk["text"]
+                    }
+                    for chunk in document_chunks
+                ]
+            ),
+            wait=wait
+        )
+
     def upsert_embeddings(
             self,
-            embeddings: list[list[float]],
-            document_chunks: list[DocumentChunk])-> bool:
+            embeddings: np.ndarray,
+            document_chunks: list[dict],
+            batch_size: int = QDRANT_UPSERT_BATCH_SIZE,
+            parallel: int = QDRANT_UPSERT_PARALLEL,
+            wait: bool = QDRANT_UPSERT_WAIT) -> bool:
+        #--- point ids derive from (document_id, chunk_index), so a retry or
+        #--- re-processing overwrites the same points instead of duplicating them
+        batches = [
+            (embeddings[start:start + batch_size], document_chunks[start:start + batch_size])
+            for start in range(0, len(document_chunks), batch_size)
+        ]
         try: 
-            points = []
-            for embedding, chunk in zip(embeddings, document_chunks):
-                points.append(
-                    PointStruct(
-                        id=id(chunk.id),
-                        vector=list(embedding),
-                        payload={
-                            "user_id": self.user_id,
-                            "document_id": chunk.document_id,
-                            "chunkk_id": chunk.id,
-                            "chunk_index": chunk.index,
-                            "text": chunk.text
-                        }
-                    )
-                )
-            
-            self.qdrant_client.upsert(
-                collection_name=COLLECTION,
-                points=points
-            )
+            if parallel <= 1 or len(batches) <= 1:
+                for batch_embeddings, batch_chunks in batches:
+                    self._upsert_batch(batch_embeddings, batch_chunks, wait)
+            else:
+                with ThreadPoolExecutor(max_workers=min(parallel, len(batches))) as executor:
+                    futures = [
+                        executor.submit(self._upsert_batch, batch_embeddings, batch_chunks, wait)
+                        for batch_embeddings, batch_chunks in batches
+                    ]
+                    for future in futures:
+                        future.result()
             return True
         except Exception as e: 
             message = f"An error occured while uploading embeddings:\n{e}"
             print(message)
             return False 
         
-    def get_document_chunks(
-        self,
-        document_id: int,
-        limit: int = 1000
-    ) -> list[str]:
-        results = []
-        offset = None
+    def search_chunks(
+            self,
+            query_vector: np.ndarray,
+            document_id: int | None = None,
+            limit: int = 10) -> list[ScoredPoint]:
+        conditions = [
+            FieldCondition(
+                key="user_id",
+                match=MatchValue(value=self.user_id)
+            )
+        ]
+        if document_id is not None:
+            conditions.append(
+                FieldCondition(
+                    key="document_id",
+                    match=MatchValue(value=document_id)
+                )
+            )
+        response = self.qdrant_client.query_points(
+            collection_name=COLLECTION,
+            query=query_vector.tolist(),
+            query_filter=Filter(must=conditions),
+            limit=limit,
+            with_payload=True,
+            with_vectors=False
+        )
+        return response.points
 
+    def scroll_document_chunks(
+            self,
+            document_id: int,
+            with_vectors: bool = False,
+            limit: int = 1000) -> list[Record]:
+        #--- ordered server-side on the chunk_index payload index. Scrolls with
+        #--- order_by can't use offsets, chunk indexes are unique per document
+        #--- so the next page simply starts after the last index seen.
         scroll_filter = Filter(
             must=[
                 FieldCondition(
@@ -106,27 +204,26 @@ class DocumindQdrantClient:
                 )
             ]
         )
-
+        results = []
+        start_from = None
         while True:
-            points, offset = self.qdrant_client.scroll(
+            points, _ = self.qdrant_client.scroll(
                 collection_name=COLLECTION,
                 scroll_filter=scroll_filter,
                 limit=limit,
-                offset=offset,
-                with_payload=True,
-                with_vectors=False
+                order_by=OrderBy(key="chunk_index", direction=Direction.ASC, start_from=start_from),
+                with_payload=["chunk_id", "chunk_index", "text"],
+                with_vectors=with_vectors
             )
-
-            for point in points:
-                results.append(
-                    (
-                        point.payload.get("chunk_index", 0),  # fallback 0 just in case
-                        point.payload.get("text", "")
-                    )
-                )
-
-            if offset is None:
+            results.extend(points)
+            if len(points) < limit:
                 break
-        results.sort(key=lambda x: x[0])
+            start_from = points[-1].payload["chunk_index"] + 1
+        return results
 
-        return [text for _, text in results]
+    def get_document_chunks(
+            self,
+            document_id: int,
+            limit: int = 1000) -> list[str]:
+        points = self.scroll_document_chunks(document_id, limit=limit)
+        return [point.payload.get("text", "") for point in points]
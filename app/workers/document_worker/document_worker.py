@@ -3,26 +3,45 @@ import re
 import sys
 import fitz
 import unicodedata
-from time import sleep
+import numpy as np
 from pathlib import Path
 from functools import wraps
+from itertools import batched
+from collections.abc import Iterator
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sentence_transformers import SentenceTransformer
 
 from app.services import (
     task_service, 
     document_service, 
+    document_chunk_service,
+    task_retention_service,
 )
 from app.database import get_session
-from app.models import document, document_chunk
+from app.core.model_registry import model_registry, EMBEDDING_MODEL_NAME
+from app.core.inference_cache import (
+    InferenceCache, 
+    INFERENCE_CACHE_ENABLED, 
+    encode_embedding, 
+    decode_embedding
+)
+from app.core.task_listener import get_task_listener
+from app.core.metrics import (
+    STAGE_SECONDS, 
+    TASKS_TOTAL, 
+    PAGES_TOTAL, 
+    CHUNKS_TOTAL, 
+    TOKENS_TOTAL, 
+    BYTES_TOTAL
+)
+from app.models import document
 from app.core.enum import worker_task_type, worker_task_status
 from app.vector_database.qdrant_client import DocumindQdrantClient
 
 #--- TODO: if upload not successfull, do not mark the task as finished 
 #--- TODO:  control the workflow of the worker
 
-EMBEDDING_MODEL = SentenceTransformer("all-mpnet-base-v2")
+NON_PRINTABLE_PATTERN = re.compile(r'[^\x20-\x7E\n\t]+')
 
 def singleton(cls):
     instances = {}
@@ -36,33 +55,38 @@ def singleton(cls):
 
 @singleton
 class DocumentWorker:
-    def __init__(self, max_tokens: int = 100, overlap: int = 90):
+    def __init__(self, 
+                 max_tokens: int = 100, 
+                 overlap: int = 90, 
+                 batch_size: int = 64,
+                 streaming: bool = False):
         self.max_tokens = max_tokens
         self.overlap = overlap
-        self.embedding_model = EMBEDDING_MODEL
+        self.batch_size = batch_size
+        self.streaming = streaming
+        self.embedding_cache = InferenceCache(
+            EMBEDDING_MODEL_NAME, 
+            encode_embedding, 
+            decode_embedding) if INFERENCE_CACHE_ENABLED else None
     
     def __enter__(self):
         return self
     
     def __exit__(self, exc_type, exc_value, traceback):
-        del self.embedding_model
+        model_registry.unload("embedding")
+
+    @property
+    def embedding_model(self):
+        return model_registry.get("embedding")
     
     def document_worker_print(self, text: str) -> None: 
         print("\033[92m {}\033[00m".format("[DocumentWorker]" + f"\t{text}"))
 
     def delete_finished_doc_proc_tasks(self, db: Session) -> None:
-        finished_doc_proc_tasks = task_service.get_finished_tasks(
+        deleted = task_retention_service.run_task_retention(
             db, 
-            worker_task_type.WorkerTaskType.DOCUMENT_PROCESSING
-        )
-        if len(finished_doc_proc_tasks) == 0:
-            self.document_worker_print("print in: delete_finished_doc_proc[info]\tFound 0 tasks for cleaning")
-            return
-        for task in finished_doc_proc_tasks:
-            db.delete(task)
-        db.commit()
-        count_deleted = len(finished_doc_proc_tasks)
-        message = f"print in: delete_finished_doc_proc2[info]\tDeleted: {count_deleted} tasks from database"
+            task_type=worker_task_type.WorkerTaskType.DOCUMENT_PROCESSING)
+        message = f"print in: delete_finished_doc_proc[info]\tDeleted: {sum(deleted.values())} expired tasks from database"
         self.document_worker_print(message)
     
     def extract_document_content(
@@ -72,8 +96,23 @@ class DocumentWorker:
         with fitz.open(document_file_path) as pdf:
             for page in pdf:
                 content += page.get_text("text")
+            PAGES_TOTAL.inc(len(pdf), pipeline="document")
         return content
     
+    def iter_document_pages(
+            self, 
+            document_file_path: str | Path) -> Iterator[str]:
+        with fitz.open(document_file_path) as pdf:
+            for page in pdf:
+                PAGES_TOTAL.inc(pipeline="document")
+                yield page.get_text("text")
+    
+    def clean_page_tokens(self, page_text: str) -> list[str]:
+        #--- same result as tokenize(clean_document_content(page_text)),
+        #--- whitespace collapsing is left to str.split()
+        page_text = unicodedata.normalize("NFKC", page_text)
+        return NON_PRINTABLE_PATTERN.sub("", page_text).split()
+    
     def clean_document_content(self, text: str) -> str:
         text = unicodedata.normalize("NFKC", text)
         text = re.sub(r'[^\x20-\x7E\n\t]', '', text)
@@ -107,37 +146,102 @@ class DocumentWorker:
                 raise ValueError(message)
         return chunks 
     
+    def stream_document_chunks(
+            self, 
+            document_file_path: str | Path) -> Iterator[str]:
+        if self.overlap >= self.max_tokens: 
+            message = "print in: stream_document_chunks: Overlap must be smaller than max_tokens"
+            raise ValueError(message)
+        step = self.max_tokens - self.overlap
+        window: list[str] = []
+        for page_text in self.iter_document_pages(document_file_path):
+            window.extend(self.clean_page_tokens(page_text))
+            while len(window) >= self.max_tokens:
+                yield self.detokenize(window[:self.max_tokens])
+                del window[:step]
+        #--- tail chunks, identical to chunkify_clean_text
+        while window:
+            yield self.detokenize(window[:self.max_tokens])
+            del window[:step]
+    
+    def encode_chunks(
+            self, 
+            chunks: list[str]) -> np.ndarray:
+        #--- longest-first so each batch holds similar lengths (less padding),
+        #--- scattered back into one contiguous float32 matrix in chunk order
+        order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]), reverse=True)
+        sorted_embeddings = self.embedding_model.encode(
+            [chunks[i] for i in order],
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False)
+        embeddings = np.empty_like(sorted_embeddings, dtype=np.float32)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+
     def convert_to_embeddings(
             self, 
-            chunk_text: str) -> list[float]:
-        embeddings = self.embedding_model.encode(chunk_text)
-        return embeddings.tolist()
+            chunks: list[str]) -> np.ndarray:
+        dimension = self.embedding_model.get_sentence_embedding_dimension()
+        if not chunks:
+            return np.empty((0, dimension), dtype=np.float32)
+        #--- repeated chunks (headers, footers, boilerplate pages) are looked up
+        #--- and encoded once, then fanned back out to every position
+        unique_chunks = list(dict.fromkeys(chunks))
+        unique_positions = {chunk: i for i, chunk in enumerate(unique_chunks)}
+        embeddings = np.empty((len(unique_chunks), dimension), dtype=np.float32)
+        if self.embedding_cache is None:
+            embeddings[:] = self.encode_chunks(unique_chunks)
+        else:
+            cached_embeddings = self.embedding_cache.get_many(unique_chunks)
+            missing = []
+            for i, cached_embedding in enumerate(cached_embeddings):
+                if cached_embedding is None:
+                    missing.append(i)
+                else:
+                    embeddings[i] = cached_embedding
+            if missing:
+                missing_chunks = [unique_chunks[i] for i in missing]
+                computed_embeddings = self.encode_chunks(missing_chunks)
+                embeddings[missing] = computed_embeddings
+                self.embedding_cache.put_many(missing_chunks, list(computed_embeddings))
+        if len(unique_chunks) == len(chunks):
+            return embeddings
+        return embeddings[[unique_positions[chunk] for chunk in chunks]]
     
-    def to_document_chunk_object(
+    def to_document_chunk_rows(
             self,
-            chunks: list[str]) -> list[document_chunk.DocumentChunk]:
-        document_chunk_objects = []
-        for i, chunk_text in enumerate(chunks):
-            chunk = document_chunk.DocumentChunk(
-                document_id=self.document_id, 
-                index = i,
-                text=chunk_text,
-                tokens=len(chunk_text.split()),
-                embeddings=self.convert_to_embeddings(chunk_text))
-            document_chunk_objects.append(chunk)
-        return document_chunk_objects
+            chunks: list[str],
+            embeddings: np.ndarray,
+            start_index: int = 0) -> list[dict]:
+        step = self.max_tokens - self.overlap
+        return [
+            {
+                "document_id": self.document_id,
+                "index": start_index + i,
+                "text": chunk_text,
+                "tokens": len(chunk_text.split()),
+                "start_token": (start_index + i) * step,
+                "embeddings": embeddings[i],
+            }
+            for i, chunk_text in enumerate(chunks)
+        ]
 
-    def save_document_chunk_object(
+    def save_document_chunk_rows(
             self,
             db: Session,
-            document_chunk_objects: list[document_chunk.DocumentChunk]) -> bool:
+            document_chunk_rows: list[dict]) -> bool:
+        #--- ids are written back into the rows, the Qdrant payload needs them
         try:
-            db.add_all(document_chunk_objects)
-            db.commit()
-            return True
-        except Exception as e:
-            print(f"print in: save_document_chunk_object: An error occured while saving the document chunk objects:\n{e}")
+            ids = document_chunk_service.bulk_insert_document_chunks(db, document_chunk_rows)
+        except RuntimeError as e:
+            print(f"print in: save_document_chunk_rows: An error occured while saving the document chunks:\n{e}")
             return False
+        for row, chunk_id in zip(document_chunk_rows, ids):
+            row["id"] = chunk_id
+        CHUNKS_TOTAL.inc(len(document_chunk_rows), pipeline="document")
+        TOKENS_TOTAL.inc(sum(row["tokens"] for row in document_chunk_rows), pipeline="document")
+        return True
         
     def delete_document_from_local_storage(
             self, 
@@ -156,14 +260,11 @@ class DocumentWorker:
         
     def upload_embeddings(
             self,
-            db: Session, 
-            document_chunks:list[document_chunk.DocumentChunk]) -> bool:
-        user_id = document_chunks[0].document.user_id
-        client = DocumindQdrantClient(user_id)
-        embeddings = [chunk.embeddings for chunk in document_chunks]
+            document_chunk_rows: list[dict],
+            embeddings: np.ndarray) -> bool:
+        client = DocumindQdrantClient(self.user_id)
         try: 
-            client.upsert_embeddings(embeddings, document_chunks)
-            return True
+            return client.upsert_embeddings(embeddings, document_chunk_rows)
         except Exception as e:
             message = f"print in upload_embeddings: An error occured while uploading embeddings!:{e}"
             print(message)
@@ -172,14 +273,61 @@ class DocumentWorker:
     def process_document(
             self, 
             db: Session, 
-            document: document.Document) -> None:
+            document: document.Document) -> bool:
         self.document_id = document.id
-        document_content = self.extract_document_content(document.file_path)
-        clean_text = self.clean_document_content(document_content)
-        document_chunks = self.chunkify_clean_text(clean_text)
-        chunk_objects = self.to_document_chunk_object(document_chunks)
-        save_document_chunks = self.save_document_chunk_object(db, chunk_objects) # noqa
-        vectors_uploaded = self.upload_embeddings(db, chunk_objects)
+        self.user_id = document.user_id
+        BYTES_TOTAL.inc(os.path.getsize(document.file_path), pipeline="document")
+        if self.streaming:
+            return self.process_document_streaming(db, document)
+        with STAGE_SECONDS.time(pipeline="document", stage="extract"):
+            document_content = self.extract_document_content(document.file_path)
+        with STAGE_SECONDS.time(pipeline="document", stage="clean"):
+            clean_text = self.clean_document_content(document_content)
+        with STAGE_SECONDS.time(pipeline="document", stage="chunk"):
+            document_chunks = self.chunkify_clean_text(clean_text)
+        if not document_chunks:
+            #--- nothing to index, fail like the streaming path does
+            self.document_worker_print(f"[error] No text extracted from document with id: {document.id}")
+            return False
+        with STAGE_SECONDS.time(pipeline="document", stage="embed"):
+            embeddings = self.convert_to_embeddings(document_chunks)
+        with STAGE_SECONDS.time(pipeline="document", stage="db_save"):
+            chunk_rows = self.to_document_chunk_rows(document_chunks, embeddings)
+            if not self.save_document_chunk_rows(db, chunk_rows):
+                return False
+        with STAGE_SECONDS.time(pipeline="document", stage="vector_upsert"):
+            vectors_uploaded = self.upload_embeddings(chunk_rows, embeddings)
+        return vectors_uploaded
+
+    def process_document_streaming(
+            self, 
+            db: Session, 
+            document: document.Document) -> bool:
+        #--- pages -> chunks -> embeddings -> db/qdrant in batches of batch_size,
+        #--- so memory stays bounded and embedding starts with the first pages
+        #--- extraction, cleaning and chunking are interleaved here, they are
+        #--- timed together as the wait for the next batch of chunks
+        chunk_index = 0
+        vectors_uploaded = True
+        chunk_batches = batched(self.stream_document_chunks(document.file_path), self.batch_size)
+        while True:
+            with STAGE_SECONDS.time(pipeline="document", stage="extract_chunk"):
+                batch = next(chunk_batches, None)
+            if batch is None:
+                break
+            chunks = list(batch)
+            with STAGE_SECONDS.time(pipeline="document", stage="embed"):
+                embeddings = self.convert_to_embeddings(chunks)
+            with STAGE_SECONDS.time(pipeline="document", stage="db_save"):
+                chunk_rows = self.to_document_chunk_rows(chunks, embeddings, chunk_index)
+                if not self.save_document_chunk_rows(db, chunk_rows):
+                    return False
+            with STAGE_SECONDS.time(pipeline="document", stage="vector_upsert"):
+                vectors_uploaded = self.upload_embeddings(chunk_rows, embeddings) and vectors_uploaded
+            chunk_index += len(chunks)
+        if chunk_index == 0:
+            self.document_worker_print(f"[error] No text extracted from document with id: {document.id}")
+            return False
         return vectors_uploaded
 
     def worker_loop(self):
@@ -187,47 +335,52 @@ class DocumentWorker:
         self.document_worker_print("Document worker started...")
         self.delete_finished_doc_proc_tasks(db)
         self.document_worker_print("Waiting for tasks...")
+        worker_id = task_service.get_worker_id()
+        task_listener = get_task_listener(
+            worker_task_type.WorkerTaskType.DOCUMENT_PROCESSING, 
+            poll_interval=10)
         try: 
             while True:
-                worker_task = task_service.get_new_task(
-                    db, task_type=worker_task_type.WorkerTaskType.DOCUMENT_PROCESSING)
-                if not worker_task:
+                claimed_tasks = task_service.claim_tasks(
+                    db, 
+                    task_type=worker_task_type.WorkerTaskType.DOCUMENT_PROCESSING,
+                    limit=1,
+                    worker_id=worker_id)
+                if not claimed_tasks:
                     db.close()
                     self.document_worker_print("print in worker_loop1: No tasks, worker going to sleep mode.")
-                    sleep(10)
+                    task_listener.wait()
                     continue
+                worker_task = claimed_tasks[0]
+                document = None
+                result = False
                 try:
                     self.document_worker_print(
                         f"print in worker_loop2: [info]Processing task with id: {worker_task.id}, with type: {worker_task.task_type}")
-                    task_service.update_worker_task(
-                        db, 
-                        worker_task, 
-                        {"status": worker_task_status.WorkerTaskStatus.PROCESSING})
                     document = document_service.get_document_by_id(db, worker_task.payload["document_id"])
-                    result = self.process_document(db, document)
+                    with STAGE_SECONDS.time(pipeline="document", stage="total"):
+                        result = self.process_document(db, document)
                     if not result:
-                        task_service.update_worker_task(
-                        db, 
-                        worker_task, 
-                        {"status": worker_task_status.WorkerTaskStatus.FAILED})
                         raise RuntimeError("Failed to process document.")
+                    document_service.mark_document_processed(db, document)
                 except Exception as e:
-                    task_service.update_worker_task(
-                        db, 
-                        worker_task, 
-                        {"status": worker_task_status.WorkerTaskStatus.FAILED})
                     self.document_worker_print(f"print in worker_loop3: An error occured while processing the task: {e}")
                 finally:
+                    status = worker_task_status.WorkerTaskStatus.FINISHED if result \
+                        else worker_task_status.WorkerTaskStatus.FAILED
                     task_service.update_worker_task(
                         db, 
                         worker_task, 
-                        {"status": worker_task_status.WorkerTaskStatus.FINISHED,
+                        {"status": status,
                         "finshed_at": datetime.utcnow()})
-                    if not result:
-                        result=False
+                    TASKS_TOTAL.inc(task_type=worker_task.task_type, status=status.value)
                     self.document_worker_print(
-                        f"print in worker_loop4: [info] Processing task for document with id:{document.id} is finished: {result}")
-                    self.delete_document_from_local_storage(db, document)
+                        f"print in worker_loop4: [info] Processing task with id:{worker_task.id} is finished: {result}")
+                    if self.embedding_cache is not None:
+                        self.document_worker_print(
+                            f"print in worker_loop5: [info] Embedding cache: {self.embedding_cache.stats()}")
+                    if document is not None:
+                        self.delete_document_from_local_storage(db, document)
         except KeyboardInterrupt:
             self.document_worker_print("Worker stopped.\n\n")
             self.document_worker_print("="*55)
@@ -1,11 +1,106 @@
+import os
+import gc
+import signal
+import multiprocessing
+from time import sleep, monotonic
 from art import * # noqa
+from multiprocessing.connection import wait
 
+from app.database import engine
+from app.core.model_registry import model_registry
+from app.core.metrics import start_metrics_server
 from .document_worker import DocumentWorker
 
+DOCUMENT_WORKER_POOL_SIZE = int(os.getenv("DOCUMENT_WORKER_POOL_SIZE", "1"))
+#--- 0 means: split the available cores evenly between the pool workers
+DOCUMENT_WORKER_THREADS = int(os.getenv("DOCUMENT_WORKER_THREADS", "0"))
+DOCUMENT_WORKER_RESTART_BACKOFF_MAX_SECONDS = float(os.getenv("DOCUMENT_WORKER_RESTART_BACKOFF_MAX_SECONDS", "60"))
+DOCUMENT_WORKER_HEALTHY_SECONDS = float(os.getenv("DOCUMENT_WORKER_HEALTHY_SECONDS", "60"))
+
+def get_threads_per_worker(pool_size: int) -> int:
+    if DOCUMENT_WORKER_THREADS > 0:
+        return DOCUMENT_WORKER_THREADS
+    return max(1, (os.cpu_count() or 1) // pool_size)
+
+def create_document_worker() -> DocumentWorker:
+    return DocumentWorker(
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+        streaming=os.getenv("DOCUMENT_WORKER_STREAMING", "false").lower() == "true")
+
+def run_pool_worker(threads_per_worker: int) -> None:
+    import torch
+    torch.set_num_threads(threads_per_worker)
+    #--- pooled connections were opened by the parent, never reuse them after fork
+    engine.dispose(close=False)
+    #--- one endpoint per forked worker, counters are per process
+    start_metrics_server()
+    create_document_worker().worker_loop()
+
+def start_pool_worker(
+        context: multiprocessing.context.BaseContext,
+        worker_number: int,
+        threads_per_worker: int) -> multiprocessing.Process:
+    process = context.Process(
+        target=run_pool_worker,
+        args=(threads_per_worker,),
+        name=f"DocumentWorker-{worker_number}")
+    process.start()
+    print(f"[DocumentWorkerPool]\tStarted {process.name} (pid: {process.pid})")
+    return process
+
+def run_pool(pool_size: int) -> None:
+    #--- the embedding model is warmed up in the parent, so forked workers share
+    #--- its weights copy-on-write instead of loading it pool_size times
+    threads_per_worker = get_threads_per_worker(pool_size)
+    model_registry.warmup("embedding")
+    print(f"[DocumentWorkerPool]\tModel timings: {model_registry.timings()}")
+    print(f"[DocumentWorkerPool]\tStarting {pool_size} workers, {threads_per_worker} threads each")
+    context = multiprocessing.get_context("fork")
+    gc.freeze()
+    processes = {
+        number: start_pool_worker(context, number, threads_per_worker)
+        for number in range(pool_size)}
+    started_at = {number: monotonic() for number in processes}
+    failures = {number: 0 for number in processes}
+    try:
+        while processes:
+            sentinels = {process.sentinel: number for number, process in processes.items()}
+            for sentinel in wait(list(sentinels)):
+                number = sentinels[sentinel]
+                process = processes.pop(number)
+                process.join()
+                if process.exitcode == 0:
+                    print(f"[DocumentWorkerPool]\t{process.name} stopped.")
+                    continue
+                #--- crash loops back off exponentially, a long healthy run resets it
+                if monotonic() - started_at[number] >= DOCUMENT_WORKER_HEALTHY_SECONDS:
+                    failures[number] = 0
+                failures[number] += 1
+                backoff = min(2 ** (failures[number] - 1), DOCUMENT_WORKER_RESTART_BACKOFF_MAX_SECONDS)
+                print(f"[DocumentWorkerPool]\t{process.name} exited with code {process.exitcode}, "
+                      f"restarting in {backoff:.0f}s...")
+                sleep(backoff)
+                processes[number] = start_pool_worker(context, number, threads_per_worker)
+                started_at[number] = monotonic()
+    except KeyboardInterrupt:
+        #--- the supervisor signals only this process, pass it on to the members
+        for process in processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGINT)
+        for process in processes.values():
+            process.join()
+        print("[DocumentWorkerPool]\tPool stopped.")
+
 def main():
-    document_worker = DocumentWorker()
+    if DOCUMENT_WORKER_POOL_SIZE > 1:
+        run_pool(DOCUMENT_WORKER_POOL_SIZE)
+        return
+    model_registry.warmup("embedding")
+    print(f"[DocumentWorker]\tModel timings: {model_registry.timings()}")
+    start_metrics_server()
+    document_worker = create_document_worker()
     document_worker.worker_loop()
 
 if __name__ == "__main__":
     tprint("DocumentWorker") # noqa
-    main()
\ No newline at end of file
+    main()
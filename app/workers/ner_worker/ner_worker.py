@@ -1,24 +1,71 @@
+import os
 import sys
-import json
 import numpy as np
-from time import sleep
 from pathlib import Path
-import onnxruntime as ort
+from bisect import bisect_left, bisect_right
 from functools import wraps
+from itertools import batched
 from datetime import datetime 
-from transformers import pipeline
 from sqlalchemy.orm import Session
-from transformers import (
-    AutoTokenizer, 
-    AutoModelForTokenClassification
-)
 
 from app.database import get_session
+from app.core.inference_cache import (
+    InferenceCache, 
+    INFERENCE_CACHE_ENABLED, 
+    encode_json, 
+    decode_json
+)
+from app.core.task_listener import get_task_listener
+from app.core.model_registry import model_registry
+from app.core.metrics import STAGE_SECONDS, TASKS_TOTAL, CHUNKS_TOTAL, TOKENS_TOTAL
 from app.models.worker_task import WorkerTask
 from app.models.document_chunk import DocumentChunk
-from app.services import document_chunk_service, task_service
+from app.services import (
+    chunk_reader_service,
+    document_chunk_service, 
+    document_metadata_service, 
+    task_service,
+    task_retention_service
+)
 from app.core.enum import worker_task_status, worker_task_type
 
+NER_MODEL_NAME = "dslim/bert-base-NER"
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "32"))
+#--- pytorch: transformers pipeline, onnx: OnnxNEREngine over the exported model
+NER_BACKEND = os.getenv("NER_BACKEND", "pytorch")
+NER_ONNX_QUANTIZED = os.getenv("NER_ONNX_QUANTIZED", "false").lower() == "true"
+#--- model tokens per non-overlapping NER window ([CLS]/[SEP] excluded)
+NER_WINDOW_TOKENS = int(os.getenv("NER_WINDOW_TOKENS", "510"))
+NER_UPDATE_BATCH_SIZE = 1000
+
+def load_ner_model(
+        model_path: str | Path, 
+        backend: str, 
+        quantized: bool, 
+        batch_size: int):
+    if backend == "onnx":
+        from app.workers.ner_worker.onnx_ner_engine import OnnxNEREngine
+        return OnnxNEREngine(
+            model_path, 
+            NER_MODEL_NAME, 
+            quantized=quantized, 
+            batch_size=batch_size)
+    from transformers import (
+        pipeline, 
+        AutoTokenizer, 
+        AutoModelForTokenClassification
+    )
+    tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_NAME)
+    model = AutoModelForTokenClassification.from_pretrained(NER_MODEL_NAME)
+    return pipeline(
+        "ner", 
+        model=model, 
+        tokenizer=tokenizer, 
+        aggregation_strategy="simple")
+
+def warmup_ner_model(nlp) -> None:
+    nlp(["DocuMind warms up the NER model in Berlin."])
+
 def singleton(cls):
     instances = {}
 
@@ -31,110 +78,273 @@ def singleton(cls):
 
 @singleton
 class NERWorker:
-    def __init__(self, model_path: str | Path):
-        tokenizer = AutoTokenizer.from_pretrained("dslim/bert-base-NER")
-        model = AutoModelForTokenClassification.from_pretrained("dslim/bert-base-NER")
-
-        self.nlp = pipeline("ner", model=model, tokenizer=tokenizer)
-        self.model_session = ort.InferenceSession(model_path)
-        self.tokenizer = AutoTokenizer.from_pretrained("xlm-roberta-base")
-        self.label_map = {0: "O", 1: "PER", 2: "ORG", 3: "LOC", 4: "MISC"} 
+    def __init__(self, 
+                 model_path: str | Path, 
+                 batch_size: int = NER_BATCH_SIZE,
+                 backend: str = NER_BACKEND,
+                 quantized: bool = NER_ONNX_QUANTIZED):
+        self.batch_size = batch_size
+        self.backend = backend
+        if backend == "onnx":
+            cache_model_id = f"{NER_MODEL_NAME}:onnx{':int8' if quantized else ''}"
+        else:
+            cache_model_id = f"{NER_MODEL_NAME}:pytorch"
+        #--- nothing is loaded here, the entry point calls warmup()
+        self.model_name = f"ner:{cache_model_id}"
+        model_registry.register(
+            self.model_name,
+            lambda: load_ner_model(model_path, backend, quantized, batch_size),
+            warmup=warmup_ner_model,
+            imports=("onnxruntime", "transformers") if backend == "onnx" else ("transformers",))
+        self.entity_cache = InferenceCache(
+            cache_model_id, 
+            encode_json, 
+            decode_json) if INFERENCE_CACHE_ENABLED else None
     
     def __enter__(self):
         return self
     
     def __exit__(self, exc_type, exc_value, traceback):
-        del self.embedding_model
-        del self.tokenizer
+        model_registry.unload(self.model_name)
+
+    @property
+    def nlp(self):
+        return model_registry.get(self.model_name)
+
+    def warmup(self) -> None:
+        model_registry.warmup(self.model_name)
+        self.ner_worker_print(f"[info]\tModel timings: {model_registry.timings()[self.model_name]}")
 
     def ner_worker_print(self, text: str) -> None:
         print("\033[93m {}\033[00m".format(text))
 
     def delete_finished_tasks(self, db: Session) -> None: 
-        self.ner_worker_print("[info]\tDeleting finished NER tasks...")
-        finished_ner_tasks = task_service.get_finished_tasks(
+        self.ner_worker_print("[info]\tDeleting expired NER tasks...")
+        deleted = task_retention_service.run_task_retention(
             db, 
-            worker_task_type.WorkerTaskType.ENTITY_EXTRACTION
-        )
-        if len(finished_ner_tasks) == 0:
-            self.ner_worker_print("Found 0 finished tasks.")
-            return
-        for task in finished_ner_tasks:
-            db.delete(task)
-        db.commit()
-        message = f"Deleted {len(finished_ner_tasks)}, finished NER tasks."
+            task_type=worker_task_type.WorkerTaskType.ENTITY_EXTRACTION)
+        message = f"Deleted {sum(deleted.values())} expired NER tasks."
         self.ner_worker_print(message)
     
-    def convert_text_to_tokens(self, chunk: DocumentChunk):
-        self.ner_worker_print("Converting to tokens...")
-        return self.tokenizer(chunk.text, return_tensors="np")
-    
-    def extract_named_entities(self, inputs):
-        self.ner_worker_print("Running model...")
-        outputs = self.model_session.run(None, {
-            "input_ids": inputs["input_ids"], 
-            "attention_mask": inputs["attention_mask"]})
-        logits = outputs[0]
-        pred_ids = np.argmax(logits, axis=-1)[0]
-        return pred_ids
-    
-    def convert_ids_to_tokens(self, pred_ids, inputs):
-        return self.tokenizer.convert_ids_to_tokens(inputs["input_ids"][0])
-    
-    def extract_entities(self, chunk: DocumentChunk) -> dict[str, any]:
-        processing_text = chunk.text
-        result = self.nlp(processing_text)
-        return result
+    def to_json_entities(self, entities: list[dict]) -> list[dict]:
+        #--- the pipeline returns numpy scalars (score, index), which json can't encode
+        return [
+            {key: value.item() if isinstance(value, np.generic) else value 
+             for key, value in entity.items()}
+            for entity in entities
+        ]
+
+    def run_model(self, texts: list[str]) -> list[list[dict]]:
+        if self.backend == "onnx":
+            return self.nlp(texts)
+        return self.nlp(texts, batch_size=self.batch_size)
+
+    def extract_entities_batch(self, texts: list[str]) -> list[list[dict]]:
+        #--- repeated texts are looked up and run through the model once
+        unique_texts = list(dict.fromkeys(texts))
+        entities = self.entity_cache.get_many(unique_texts) if self.entity_cache is not None \
+            else [None] * len(unique_texts)
+        missing = [i for i, cached_entities in enumerate(entities) if cached_entities is None]
+        if missing:
+            missing_texts = [unique_texts[i] for i in missing]
+            results = self.run_model(missing_texts)
+            results = [self.to_json_entities(result) for result in results]
+            for i, result in zip(missing, results):
+                entities[i] = result
+            if self.entity_cache is not None:
+                self.entity_cache.put_many(missing_texts, results)
+        unique_entities = dict(zip(unique_texts, entities))
+        return [unique_entities[text] for text in texts]
+
+    def extract_entities(self, chunk: DocumentChunk) -> list[dict]:
+        return self.extract_entities_batch([chunk.text])[0]
+
+    def infer_start_token(
+            self, 
+            document_tokens: list[str], 
+            chunk_tokens: list[str]) -> int:
+        #--- chunks saved before start_token existed: find the longest suffix of
+        #--- the document so far that the chunk starts with
+        for overlap in range(min(len(document_tokens), len(chunk_tokens)), 0, -1):
+            if document_tokens[-overlap:] == chunk_tokens[:overlap]:
+                return len(document_tokens) - overlap
+        return len(document_tokens)
+
+    def reconstruct_document(
+            self, 
+            chunk_texts: list[str],
+            chunk_start_tokens: list[int | None]) -> tuple[str, list[tuple[int, int]]]:
+        #--- rebuilds the document text from its overlapping chunks and returns
+        #--- the (start, end) character span of every chunk inside that text
+        document_tokens: list[str] = []
+        chunk_token_spans = []
+        for chunk_text, chunk_start_token in zip(chunk_texts, chunk_start_tokens):
+            chunk_tokens = chunk_text.split()
+            start_token = chunk_start_token if chunk_start_token is not None \
+                else self.infer_start_token(document_tokens, chunk_tokens)
+            document_tokens.extend(chunk_tokens[len(document_tokens) - start_token:])
+            chunk_token_spans.append((start_token, start_token + len(chunk_tokens)))
+
+        token_char_starts = []
+        position = 0
+        for token in document_tokens:
+            token_char_starts.append(position)
+            position += len(token) + 1
+        chunk_spans = [
+            (token_char_starts[start], token_char_starts[end - 1] + len(document_tokens[end - 1]))
+            if end > start else (0, 0)
+            for start, end in chunk_token_spans
+        ]
+        return " ".join(document_tokens), chunk_spans
+
+    def window_document(self, document_text: str) -> list[tuple[int, int]]:
+        #--- non-overlapping windows of at most NER_WINDOW_TOKENS model tokens,
+        #--- cut at word starts so no word is split between two windows
+        offsets = self.nlp.tokenizer(
+            document_text, 
+            add_special_tokens=False, 
+            return_offsets_mapping=True,
+            verbose=False)["offset_mapping"]
+        windows = []
+        start_token = 0
+        while start_token < len(offsets):
+            end_token = min(start_token + NER_WINDOW_TOKENS, len(offsets))
+            cut_token = end_token
+            while end_token < len(offsets) and cut_token > start_token + 1 \
+                    and offsets[cut_token][0] == offsets[cut_token - 1][1]:
+                cut_token -= 1
+            if cut_token > start_token + 1:
+                end_token = cut_token
+            windows.append((offsets[start_token][0], offsets[end_token - 1][1]))
+            start_token = end_token
+        return windows
+
+    def map_entities_to_chunks(
+            self, 
+            document_entities: list[dict], 
+            chunk_spans: list[tuple[int, int]]) -> list[list[dict]]:
+        #--- chunk starts and ends are both sorted, so the chunks that fully
+        #--- contain an entity form one contiguous range found by bisection
+        chunk_starts = [start for start, _ in chunk_spans]
+        chunk_ends = [end for _, end in chunk_spans]
+        chunk_entities: list[list[dict]] = [[] for _ in chunk_spans]
+        for entity in document_entities:
+            first_chunk = bisect_left(chunk_ends, entity["end"])
+            last_chunk = bisect_right(chunk_starts, entity["start"])
+            for i in range(first_chunk, last_chunk):
+                chunk_entities[i].append({
+                    **entity,
+                    "start": entity["start"] - chunk_starts[i],
+                    "end": entity["end"] - chunk_starts[i]
+                })
+        return chunk_entities
+
+    def aggregate_global_entities(self, document_entities: list[dict]) -> list[dict]:
+        global_entities: dict[tuple[str, str], dict] = {}
+        for entity in document_entities:
+            text = " ".join(entity["word"].split())
+            key = (entity["entity_group"], text.lower())
+            if key not in global_entities:
+                global_entities[key] = {
+                    "text": text, 
+                    "label": entity["entity_group"], 
+                    "count": 0, 
+                    "score": 0.0,
+                    "offsets": []
+                }
+            global_entity = global_entities[key]
+            global_entity["count"] += 1
+            global_entity["score"] += entity["score"]
+            global_entity["offsets"].append([entity["start"], entity["end"]])
+        for global_entity in global_entities.values():
+            global_entity["score"] /= global_entity["count"]
+        return sorted(global_entities.values(), key=lambda entity: -entity["count"])
 
     def ner_processing(self, 
                        db: Session, 
                        ner_task: WorkerTask) -> None:
+        #--- NER runs once over the document in non-overlapping windows instead of
+        #--- over every (heavily overlapping) chunk, spans are then mapped back
         document_id = int(ner_task.payload["document_id"])
-        document_chunks = document_chunk_service.get_chunks_by_document_id(db, document_id)
-        entities = []
-        for chunk in document_chunks:
-            entities = self.extract_entities(chunk)
-            print(f"ENTITIES FROM CHUNK WITH ID: {chunk.id}:\n{entities}\n")
-            document_chunk_service.update_document_chunk(
+        with STAGE_SECONDS.time(pipeline="ner", stage="load_chunks"):
+            ordered_chunks = chunk_reader_service.get_ordered_chunks(db, document_id)
+        with STAGE_SECONDS.time(pipeline="ner", stage="reconstruct"):
+            document_text, chunk_spans = self.reconstruct_document(
+                ordered_chunks.texts, 
+                ordered_chunks.start_tokens)
+            windows = self.window_document(document_text)
+        with STAGE_SECONDS.time(pipeline="ner", stage="inference"):
+            window_entities = self.extract_entities_batch(
+                [document_text[start:end] for start, end in windows])
+        document_entities = [
+            {**entity, "start": entity["start"] + start, "end": entity["end"] + start}
+            for (start, _), entities in zip(windows, window_entities)
+            for entity in entities
+        ]
+
+        with STAGE_SECONDS.time(pipeline="ner", stage="map_entities"):
+            chunk_entities = self.map_entities_to_chunks(document_entities, chunk_spans)
+        rows = [
+            {"id": chunk_id, "ner_entities": entities} 
+            for chunk_id, entities in zip(ordered_chunks.chunk_ids, chunk_entities)
+            if chunk_id is not None
+        ]
+        with STAGE_SECONDS.time(pipeline="ner", stage="db_save"):
+            for batch in batched(rows, NER_UPDATE_BATCH_SIZE):
+                document_chunk_service.bulk_update_document_chunks(db, list(batch))
+
+            document_metadata_service.get_or_create_document_metadata(db, document_id)
+            document_metadata_service.update_document_metadata(
                 db, 
-                chunk, 
-                {"ner_entities": json.dumps(str(entities))})
+                document_id, 
+                {"global_entities": self.aggregate_global_entities(document_entities),
+                 "total_chunks": len(ordered_chunks)})
+        CHUNKS_TOTAL.inc(len(ordered_chunks), pipeline="ner")
+        TOKENS_TOTAL.inc(document_text.count(" ") + 1 if document_text else 0, pipeline="ner")
+        self.ner_worker_print(
+            f"Extracted {len(document_entities)} entities from {len(windows)} windows "
+            f"for {len(ordered_chunks)} chunks of document with id: {document_id}")
+        if self.entity_cache is not None:
+            self.ner_worker_print(f"Entity cache: {self.entity_cache.stats()}")
         
     def ner_worker_loop(self) -> None:
         db = get_session()
         self.ner_worker_print("NER worker started...")
         self.delete_finished_tasks(db)
         self.ner_worker_print("Waiting for tasks...")
+        worker_id = task_service.get_worker_id()
+        task_listener = get_task_listener(
+            worker_task_type.WorkerTaskType.ENTITY_EXTRACTION, 
+            poll_interval=1)
         try: 
             while True:
-                ner_task = task_service.get_new_task(
+                claimed_tasks = task_service.claim_tasks(
                     db, 
-                    task_type=worker_task_type.WorkerTaskType.ENTITY_EXTRACTION)
-                if not ner_task:
+                    task_type=worker_task_type.WorkerTaskType.ENTITY_EXTRACTION,
+                    limit=1,
+                    worker_id=worker_id)
+                if not claimed_tasks:
                     db.close()
                     self.ner_worker_print("No tasks, worker going to sleep mode...")
-                    sleep(1)
+                    task_listener.wait()
                     continue
+                ner_task = claimed_tasks[0]
+                status = worker_task_status.WorkerTaskStatus.FINISHED
                 try:
-                    task_service.update_worker_task(
-                        db, 
-                        ner_task, 
-                        {"status": worker_task_status.WorkerTaskStatus.PROCESSING})
-                    self.ner_processing(db, ner_task)
+                    with STAGE_SECONDS.time(pipeline="ner", stage="total"):
+                        self.ner_processing(db, ner_task)
                 except Exception as e:
-                    task_service.update_worker_task(
-                        db, 
-                        ner_task, 
-                        {"status": worker_task_status.WorkerTaskStatus.FAILED})
+                    status = worker_task_status.WorkerTaskStatus.FAILED
                     self.ner_worker_print(
-                        f"An error occured while processing task with id:{id}, error message:{e}")
+                        f"An error occured while processing task with id:{ner_task.id}, error message:{e}")
                 finally:
                     task_service.update_worker_task(
                         db,
                         ner_task,
-                        {"status": worker_task_status.WorkerTaskStatus.FINISHED, 
+                        {"status": status, 
                          "finshed_at": datetime.utcnow()}
                     )
+                    TASKS_TOTAL.inc(task_type=ner_task.task_type, status=status.value)
         except KeyboardInterrupt:
             self.ner_worker_print("Worker stopped.\n\n")
             self.ner_worker_print("="*55)
@@ -1,20 +1,26 @@
 import os
 from art import * #noqa
 
+from app.core.metrics import start_metrics_server
 from .ner_worker import NERWorker
 
 def get_model_path() -> os.path:
+    #--- exported from NER_MODEL_NAME on first use when the file is missing
+    if os.getenv("NER_ONNX_MODEL_PATH"):
+        return os.getenv("NER_ONNX_MODEL_PATH")
     current_dir = os.path.dirname(__file__)
     model_path = os.path.join(
-        current_dir, "..", "..", "core", "onnx", "xlm_roberta_ner.onnx")
+        current_dir, "..", "..", "core", "onnx", "bert_base_ner.onnx")
     model_path = os.path.abspath(model_path)
     return model_path
     
 def main() -> None:
     model_path = get_model_path()
     ner_worker = NERWorker(model_path)
+    ner_worker.warmup()
+    start_metrics_server()
     ner_worker.ner_worker_loop()
 
-if "__name__==__main__":
+if __name__ == "__main__":
     tprint("NER Worker") #noqa
     main()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import os
+import numpy as np
+from pathlib import Path
+import onnxruntime as ort
+from transformers import AutoConfig, AutoTokenizer
+
+#--- 0 lets ONNX Runtime use every physical core for one request
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+PADDING_BUCKET_SIZE = 16
+
+def export_onnx_model(model_name: str, output_path: str | Path) -> Path:
+    import torch
+    from transformers import AutoModelForTokenClassification
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForTokenClassification.from_pretrained(model_name)
+    model.eval()
+    inputs = tokenizer("DocuMind exports this model to ONNX.", return_tensors="pt")
+    torch.onnx.export(
+        model,
+        (inputs["input_ids"], inputs["attention_mask"]),
+        str(output_path),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch", 1: "sequence"},
+        },
+        opset_version=17,
+    )
+    return output_path
+
+def quantize_onnx_model(model_path: str | Path) -> Path:
+    #--- dynamic int8: weights quantized ahead of time, activations at runtime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model_path = Path(model_path)
+    quantized_path = model_path.with_name(f"{model_path.stem}.int8.onnx")
+    if not quantized_path.exists():
+        quantize_dynamic(str(model_path), str(quantized_path), weight_type=QuantType.QInt8)
+    return quantized_path
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    exponents = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exponents / exponents.sum(axis=-1, keepdims=True)
+
+class OnnxNEREngine:
+    def __init__(self,
+                 model_path: str | Path,
+                 model_name: str,
+                 quantized: bool = False,
+                 batch_size: int = 32,
+                 max_length: int = 512,
+                 intra_op_threads: int = ONNX_INTRA_OP_THREADS,
+                 inter_op_threads: int = ONNX_INTER_OP_THREADS):
+        model_path = Path(model_path)
+        if not model_path.exists():
+            export_onnx_model(model_name, model_path)
+        if quantized:
+            model_path = quantize_onnx_model(model_path)
+
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        session_options.intra_op_num_threads = intra_op_threads
+        session_options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(
+            str(model_path),
+            sess_options=session_options,
+            providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.max_length = max_length
+        #--- fast tokenizer, offsets map tokens back to character spans
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        self.id2label = AutoConfig.from_pretrained(model_name).id2label
+
+    def get_padded_length(self, length: int) -> int:
+        padded_length = -(-length // PADDING_BUCKET_SIZE) * PADDING_BUCKET_SIZE
+        return min(padded_length, self.max_length)
+
+    def run_batch(self, input_ids: list[list[int]]) -> np.ndarray:
+        padded_length = self.get_padded_length(max(len(ids) for ids in input_ids))
+        batch_input_ids = np.full(
+            (len(input_ids), padded_length), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(input_ids), padded_length), dtype=np.int64)
+        for row, ids in enumerate(input_ids):
+            batch_input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        feeds = {"input_ids": batch_input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(batch_input_ids)
+        logits = self.session.run(None, feeds)[0]
+        return softmax(logits)
+
+    def aggregate_entities(
+            self,
+            text: str,
+            probabilities: np.ndarray,
+            offsets: list[tuple[int, int]],
+            special_tokens_mask: list[int]) -> list[dict]:
+        #--- BIO tags -> character spans. A token continues the current entity when
+        #--- it has the same type and is either I- tagged or a sub-word glued to it.
+        label_ids = probabilities.argmax(axis=-1)
+        label_scores = probabilities.max(axis=-1)
+        entities = []
+        current = None
+        for token_index, (start, end) in enumerate(offsets):
+            if special_tokens_mask[token_index] or start == end:
+                continue
+            label = self.id2label[int(label_ids[token_index])]
+            if label == "O":
+                current = None
+                continue
+            prefix, entity_type = label.split("-", 1) if "-" in label else ("I", label)
+            score = float(label_scores[token_index])
+            if current is not None and current["entity_group"] == entity_type \
+                    and (prefix == "I" or start == current["end"]):
+                current["end"] = end
+                current["scores"].append(score)
+                continue
+            current = {"entity_group": entity_type, "start": start, "end": end, "scores": [score]}
+            entities.append(current)
+        return [
+            {
+                "entity_group": entity["entity_group"],
+                "score": float(np.mean(entity["scores"])),
+                "word": text[entity["start"]:entity["end"]],
+                "start": entity["start"],
+                "end": entity["end"],
+            }
+            for entity in entities
+        ]
+
+    def __call__(self, texts: list[str]) -> list[list[dict]]:
+        #--- sequences are sorted by length and padded per batch to a multiple of
+        #--- PADDING_BUCKET_SIZE, so short chunks never pay for the longest one
+        if not texts:
+            return []
+        encodings = self.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.max_length,
+            return_offsets_mapping=True,
+            return_special_tokens_mask=True)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        results: list[list[dict]] = [[] for _ in texts]
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            probabilities = self.run_batch([encodings["input_ids"][i] for i in batch])
+            for row, i in enumerate(batch):
+                results[i] = self.aggregate_entities(
+                    texts[i],
+                    probabilities[row, :lengths[i]],
+                    encodings["offset_mapping"][i],
+                    encodings["special_tokens_mask"][i])
+        return results
@@ -0,0 +1,54 @@
+import sys
+from time import sleep
+from functools import wraps
+
+from app.database import get_session
+from app.services import task_retention_service
+
+def singleton(cls):
+    instances = {}
+
+    @wraps(cls)
+    def get_instance(*args, **kwargs):
+        if cls not in instances:
+            instances[cls] = cls(*args, **kwargs)
+            return instances[cls]
+    return get_instance
+
+@singleton
+class RetentionWorker:
+    def __init__(self, interval_seconds: int = task_retention_service.TASK_RETENTION_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self
+
+    def retention_worker_print(self, text: str) -> None:
+        print("\033[95m {}\033[00m".format(f"[RetentionWorker] \t{text}"))
+
+    def run_once(self) -> None:
+        db = get_session()
+        try:
+            deleted = task_retention_service.run_task_retention(db)
+            summary = ", ".join(f"{status.value}: {count}" for status, count in deleted.items())
+            self.retention_worker_print(f"[info] Deleted expired tasks ({summary or 'retention disabled'})")
+        finally:
+            db.close()
+
+    def worker_loop(self) -> None:
+        self.retention_worker_print(
+            f"Starting retention loop, running every {self.interval_seconds} seconds...")
+        try:
+            while True:
+                try:
+                    self.run_once()
+                except Exception as e:
+                    self.retention_worker_print(f"[error] Task retention failed: {e}")
+                sleep(self.interval_seconds)
+        except KeyboardInterrupt:
+            self.retention_worker_print("Worker stopped.\n\n")
+            self.retention_worker_print("="*55)
+            sys.exit(0)
@@ -0,0 +1,12 @@
+from art import * # noqa
+from app.core.metrics import start_metrics_server
+from .retention_worker import RetentionWorker
+
+def main():
+    start_metrics_server()
+    with RetentionWorker() as worker:
+        worker.worker_loop()
+
+if __name__ == "__main__":
+    tprint("Retention Worker") # noqa
+    main()
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+
+SUMMARY_METHOD = os.getenv("SUMMARY_METHOD", "textrank")
+SUMMARY_LENGTH = int(os.getenv("SUMMARY_LENGTH", "5"))
+SUMMARY_REDUNDANCY_THRESHOLD = float(os.getenv("SUMMARY_REDUNDANCY_THRESHOLD", "0.85"))
+#--- above this many chunks the document is summarized section by section
+SUMMARY_MAP_REDUCE_THRESHOLD = int(os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD", "512"))
+SUMMARY_SECTION_SIZE = int(os.getenv("SUMMARY_SECTION_SIZE", "128"))
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+class ExtractiveSummarizer:
+    #--- ranks the stored chunk embeddings (no model, no network) and returns the
+    #--- best, mutually non-redundant chunks in document order
+    def __init__(self,
+                 method: str = SUMMARY_METHOD,
+                 summary_length: int = SUMMARY_LENGTH,
+                 redundancy_threshold: float = SUMMARY_REDUNDANCY_THRESHOLD,
+                 map_reduce_threshold: int = SUMMARY_MAP_REDUCE_THRESHOLD,
+                 section_size: int = SUMMARY_SECTION_SIZE,
+                 damping: float = 0.85,
+                 max_iterations: int = 100,
+                 tolerance: float = 1e-6):
+        if method not in ("textrank", "centroid"):
+            raise ValueError(f"Unknown summarization method: {method}")
+        if section_size <= summary_length:
+            raise ValueError("section_size must be larger than summary_length")
+        self.method = method
+        self.summary_length = summary_length
+        self.redundancy_threshold = redundancy_threshold
+        self.map_reduce_threshold = max(map_reduce_threshold, section_size)
+        self.section_size = section_size
+        self.damping = damping
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+
+    def centroid_scores(self, normalized: np.ndarray) -> np.ndarray:
+        centroid = normalized.mean(axis=0)
+        centroid /= np.linalg.norm(centroid) or 1.0
+        return normalized @ centroid
+
+    def textrank_scores(self, normalized: np.ndarray) -> np.ndarray:
+        #--- cosine similarity matrix in one matmul, then PageRank by power iteration
+        similarity = normalized @ normalized.T
+        np.clip(similarity, 0.0, None, out=similarity)
+        np.fill_diagonal(similarity, 0.0)
+        row_sums = similarity.sum(axis=1, keepdims=True)
+        row_sums[row_sums == 0] = 1.0
+        transition = similarity / row_sums
+        count = len(normalized)
+        scores = np.full(count, 1.0 / count, dtype=normalized.dtype)
+        for _ in range(self.max_iterations):
+            new_scores = (1.0 - self.damping) / count + self.damping * (transition.T @ scores)
+            converged = np.abs(new_scores - scores).sum() < self.tolerance
+            scores = new_scores
+            if converged:
+                break
+        return scores
+
+    def select(self, normalized: np.ndarray, scores: np.ndarray) -> list[int]:
+        #--- greedy by score, skipping chunks too similar to an already selected one
+        selected: list[int] = []
+        for index in np.argsort(-scores):
+            if selected and (normalized[selected] @ normalized[index]).max() >= self.redundancy_threshold:
+                continue
+            selected.append(int(index))
+            if len(selected) == self.summary_length:
+                break
+        return sorted(selected)
+
+    def rank(self, normalized: np.ndarray) -> list[int]:
+        if len(normalized) <= self.summary_length:
+            return list(range(len(normalized)))
+        scores = self.textrank_scores(normalized) if self.method == "textrank" \
+            else self.centroid_scores(normalized)
+        return self.select(normalized, scores)
+
+    def summarize_normalized(self, normalized: np.ndarray) -> list[int]:
+        if len(normalized) <= self.map_reduce_threshold:
+            return self.rank(normalized)
+        #--- map: summarize fixed-size sections, reduce: summarize the section picks.
+        #--- Cost is O(n * section_size) instead of O(n^2).
+        candidates = []
+        for start in range(0, len(normalized), self.section_size):
+            section = normalized[start:start + self.section_size]
+            candidates.extend(start + index for index in self.rank(section))
+        candidates = np.asarray(candidates)
+        selected = self.summarize_normalized(normalized[candidates])
+        return sorted(int(candidates[index]) for index in selected)
+
+    def summarize_indices(self, embeddings: np.ndarray) -> list[int]:
+        if len(embeddings) == 0:
+            return []
+        normalized = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        return self.summarize_normalized(normalized)
+
+    def summarize(self, texts: list[str], embeddings: np.ndarray) -> str:
+        return "\n\n".join(texts[index] for index in self.summarize_indices(embeddings))
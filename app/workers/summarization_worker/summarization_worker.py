@@ -1,12 +1,19 @@
 import sys
-import time
+from datetime import datetime
 from functools import wraps
 from sqlalchemy.orm import Session
 
 from app.database import get_session
-from app.services import task_service
+from app.core.task_listener import get_task_listener
+from app.services import (
+    task_service, 
+    task_retention_service, 
+    chunk_reader_service, 
+    document_metadata_service
+)
 from app.core.enum import worker_task_type, worker_task_status
-from app.vector_database.qdrant_client import DocumindQdrantClient
+from app.core.metrics import STAGE_SECONDS, TASKS_TOTAL, CHUNKS_TOTAL
+from .extractive_summarizer import ExtractiveSummarizer
 
 def singleton(cls):
     instances = {}
@@ -21,7 +28,7 @@ def singleton(cls):
 @singleton
 class SummarizationWorker:
     def __init__(self):
-        pass
+        self.summarizer = ExtractiveSummarizer()
 
     def __enter__(self):
         return self 
@@ -36,18 +43,10 @@ class SummarizationWorker:
         print("\033[94m {}\033[00m".format(f"[SummarizationWorker] \t{text}"))
     
     def delete_finished_summarization_tasks(self, db: Session) -> None:
-        finished_summarization_tasks = task_service.get_finished_tasks(
+        deleted = task_retention_service.run_task_retention(
             db, 
-            worker_task_type.WorkerTaskType.SUMMARIZATION
-        )
-        if len(finished_summarization_tasks) == 0:
-            self.summarization_worker_print("[info]\tFound 0 tasks for cleaning")
-            return
-        for task in finished_summarization_tasks:
-            db.delete(task)
-        db.commit()
-        count_deleted = len(finished_summarization_tasks)
-        message = f"\t[info] Deleted: {count_deleted} tasks from database"
+            task_type=worker_task_type.WorkerTaskType.SUMMARIZATION)
+        message = f"\t[info] Deleted: {sum(deleted.values())} expired tasks from database"
         self.summarization_worker_print(message)
 
     def process_summarization_task(
@@ -57,44 +56,73 @@ class SummarizationWorker:
         task_payload = summarization_task.payload
         user_id = task_payload.get("user_id")
         document_id = task_payload.get("document_id")
-        qdrant_client = DocumindQdrantClient(user_id=user_id)
-        result = qdrant_client.get_document_chunks(document_id=document_id) #--- returns list[str]
-        if not result:
-            self.summarization_worker_print("An error occured while fetching document chunks")
-        print(f"Result of fetching document chunks: {result}")
+        #--- the embeddings stored by the document worker are reused, no model is loaded here
+        with STAGE_SECONDS.time(pipeline="summarization", stage="load_chunks"):
+            ordered_chunks = chunk_reader_service.get_ordered_chunks(
+                db, 
+                document_id, 
+                user_id=user_id, 
+                with_vectors=True)
+        texts = ordered_chunks.texts
+        embeddings = ordered_chunks.embeddings
+        with STAGE_SECONDS.time(pipeline="summarization", stage="rank"):
+            summary = self.summarizer.summarize(texts, embeddings)
+        with STAGE_SECONDS.time(pipeline="summarization", stage="db_save"):
+            document_metadata_service.get_or_create_document_metadata(db, document_id)
+            document_metadata_service.update_document_metadata(db, document_id, {"summary": summary})
+        CHUNKS_TOTAL.inc(len(ordered_chunks), pipeline="summarization")
+        self.summarization_worker_print(
+            f"Summarized {len(ordered_chunks)} chunks ({ordered_chunks.source}) of document with id: {document_id}")
+        return True
 
     def worker_loop(self):
         db = get_session()
         self.summarization_worker_print("Starting worker loop...")
         self.delete_finished_summarization_tasks(db)
         self.summarization_worker_print("Waiting for tasks...")
+        worker_id = task_service.get_worker_id()
+        task_listener = get_task_listener(
+            worker_task_type.WorkerTaskType.SUMMARIZATION, 
+            poll_interval=5)
         try:
             while True:
+                summarization_task = None
                 try: 
-                    summarization_task = task_service.get_new_task(
+                    claimed_tasks = task_service.claim_tasks(
                         db, 
-                        task_type=worker_task_type.WorkerTaskType.SUMMARIZATION)
-                    if summarization_task is None:
+                        task_type=worker_task_type.WorkerTaskType.SUMMARIZATION,
+                        limit=1,
+                        worker_id=worker_id)
+                    if not claimed_tasks:
                         message = "[info] No new summarization tasks found. Entering sleeping mode..."
                         self.summarization_worker_print(message)
-                        time.sleep(5) #-- change after testing 
+                        task_listener.wait()
                         continue
                     else:
+                        summarization_task = claimed_tasks[0]
                         message = f"Processing summarization task with id: {summarization_task.id}"
                         self.summarization_worker_print(message)
-                        data = {"status": worker_task_status.WorkerTaskStatus.PROCESSING}
-                        task_service.update_worker_task(db, summarization_task, data)
-                        processing_result = self.process_summarization_task(db, summarization_task)
+                        with STAGE_SECONDS.time(pipeline="summarization", stage="total"):
+                            processing_result = self.process_summarization_task(db, summarization_task)
                         if processing_result:
-                            data = {"status": worker_task_status.WorkerTaskStatus.FINISHED}
+                            data = {"status": worker_task_status.WorkerTaskStatus.FINISHED,
+                                    "finshed_at": datetime.utcnow()}
                             task_service.update_worker_task(db, summarization_task, data)
                         else:
-                            data = {"status": worker_task_status.WorkerTaskStatus.FAILED}
+                            data = {"status": worker_task_status.WorkerTaskStatus.FAILED,
+                                    "finshed_at": datetime.utcnow()}
                             task_service.update_worker_task(db, summarization_task, data)
+                        TASKS_TOTAL.inc(task_type=summarization_task.task_type, status=data["status"].value)
                 except Exception as e:
                     id = summarization_task.id if summarization_task else "N/A"
                     message = f"[error] An error occurred in summarization task with id: {id}\n {e}"
                     self.summarization_worker_print(message)
+                    if summarization_task:
+                        db.rollback()
+                        data = {"status": worker_task_status.WorkerTaskStatus.FAILED,
+                                "finshed_at": datetime.utcnow()}
+                        task_service.update_worker_task(db, summarization_task, data)
+                        TASKS_TOTAL.inc(task_type=summarization_task.task_type, status=data["status"].value)
         except KeyboardInterrupt:
             self.summarization_worker_print("Worker stopped.\n\n")
             self.summarization_worker_print("="*55)
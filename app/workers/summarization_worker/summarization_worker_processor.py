@@ -1,8 +1,10 @@
 from art import * # noqa
+from app.core.metrics import start_metrics_server
 from .summarization_worker import SummarizationWorker
 
 def main ():
     tprint("Summarization Worker") #noqa
+    start_metrics_server()
     with SummarizationWorker() as worker:
         worker.worker_loop()
 
@@ -0,0 +1,113 @@
+import os
+import json
+import argparse
+import tempfile
+from time import perf_counter
+
+from transformers import (
+    AutoTokenizer,
+    AutoModelForTokenClassification,
+    pipeline
+)
+
+from app.workers.ner_worker.onnx_ner_engine import OnnxNEREngine
+
+NER_MODEL_NAME = "dslim/bert-base-NER"
+
+#--- used when no --dataset is given, the PyTorch output is then the reference
+SAMPLE_TEXTS = [
+    "Angela Merkel met Emmanuel Macron in Paris to discuss the European Union budget.",
+    "Apple Inc. opened a new office in Berlin, according to Reuters.",
+    "The contract between Siemens AG and the City of Skopje was signed on Monday.",
+    "John Smith, a lawyer at Baker McKenzie, represented Microsoft in London.",
+    "The United Nations held its annual meeting in New York with delegates from Japan and Brazil.",
+    "Dr. Maria Garcia joined the World Health Organization in Geneva last year.",
+    "Amazon and Google were fined by the European Commission in Brussels.",
+    "This agreement is governed by the laws of the State of Delaware.",
+]
+
+def load_dataset(path: str | None) -> tuple[list[str], list[list[dict]] | None]:
+    #--- jsonl: {"text": ..., "entities": [{"start", "end", "label"}]}, entities optional
+    if path is None:
+        return SAMPLE_TEXTS, None
+    texts, gold_entities = [], []
+    with open(path) as dataset:
+        for line in dataset:
+            record = json.loads(line)
+            texts.append(record["text"])
+            gold_entities.append(record.get("entities"))
+    if any(entities is None for entities in gold_entities):
+        return texts, None
+    return texts, gold_entities
+
+def to_spans(entities: list[dict]) -> set[tuple[int, int, str]]:
+    return {
+        (entity["start"], entity["end"], entity.get("entity_group", entity.get("label")))
+        for entity in entities
+    }
+
+def f1_score(predicted: list[list[dict]], reference: list[list[dict]]) -> dict[str, float]:
+    true_positives = false_positives = false_negatives = 0
+    for predicted_entities, reference_entities in zip(predicted, reference):
+        predicted_spans = to_spans(predicted_entities)
+        reference_spans = to_spans(reference_entities)
+        true_positives += len(predicted_spans & reference_spans)
+        false_positives += len(predicted_spans - reference_spans)
+        false_negatives += len(reference_spans - predicted_spans)
+    precision = true_positives / max(true_positives + false_positives, 1)
+    recall = true_positives / max(true_positives + false_negatives, 1)
+    f1 = 2 * precision * recall / max(precision + recall, 1e-12)
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+def measure(run, texts: list[str], repeat: int) -> tuple[list[list[dict]], dict[str, float]]:
+    results = run(texts)  #--- warm-up
+    started = perf_counter()
+    for _ in range(repeat):
+        results = run(texts)
+    elapsed = perf_counter() - started
+    return results, {
+        "seconds": elapsed,
+        "texts_per_second": len(texts) * repeat / elapsed,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare PyTorch and ONNX Runtime NER on CPU")
+    parser.add_argument("--dataset", help="jsonl file with texts and optional gold entities")
+    parser.add_argument("--onnx-model-path", default=os.path.join(tempfile.gettempdir(), "bert_base_ner.onnx"))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--multiply", type=int, default=16, help="repeat the dataset to get a bigger workload")
+    parser.add_argument("--output", help="write the results as json to this file")
+    args = parser.parse_args()
+
+    texts, gold_entities = load_dataset(args.dataset)
+    texts = texts * args.multiply
+    if gold_entities is not None:
+        gold_entities = gold_entities * args.multiply
+
+    tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_NAME)
+    model = AutoModelForTokenClassification.from_pretrained(NER_MODEL_NAME)
+    pytorch_pipeline = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")
+    backends = {
+        "pytorch": lambda batch: pytorch_pipeline(batch, batch_size=args.batch_size),
+        "onnx": OnnxNEREngine(args.onnx_model_path, NER_MODEL_NAME, batch_size=args.batch_size),
+        "onnx_int8": OnnxNEREngine(args.onnx_model_path, NER_MODEL_NAME, quantized=True, batch_size=args.batch_size),
+    }
+
+    report = {"texts": len(texts), "batch_size": args.batch_size, "repeat": args.repeat, "backends": {}}
+    reference = gold_entities
+    for name, run in backends.items():
+        results, timings = measure(run, texts, args.repeat)
+        if reference is None:
+            #--- no gold labels: score against the PyTorch pipeline (agreement F1)
+            reference = results
+        report["backends"][name] = {**timings, **f1_score(results, reference)}
+        print(f"[{name}]\t{report['backends'][name]}")
+    report["reference"] = "gold" if gold_entities is not None else "pytorch"
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from time import perf_counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+#--- local stand-ins, set before any app module builds its engine or client
+BENCHMARK_DIR = os.path.join(tempfile.gettempdir(), "documind_benchmark")
+os.environ.setdefault("DB_CONNECTION_STRING", f"sqlite:///{os.path.join(BENCHMARK_DIR, 'documind.db')}")
+os.environ.setdefault("QDRANT_COLLECTION_NAME", "documind_benchmark")
+#--- the local in-memory Qdrant is not thread-safe
+os.environ.setdefault("QDRANT_UPSERT_PARALLEL", "1")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import numpy as np  # noqa: E402
+from qdrant_client import QdrantClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from app.core.model_registry import model_registry  # noqa: E402
+from app.services import chunk_reader_service  # noqa: E402
+from app.vector_database import qdrant_client  # noqa: E402
+from app.vector_database.qdrant_client import DocumindQdrantClient  # noqa: E402
+from app.workers.document_worker.document_worker import DocumentWorker  # noqa: E402
+from app.workers.ner_worker.ner_worker import NERWorker  # noqa: E402
+from app.workers.summarization_worker.summarization_worker import SummarizationWorker  # noqa: E402
+from benchmarks.synthetic_corpus import CORPUS_SIZES, DEFAULT_SEED, generate_corpus  # noqa: E402
+from benchmarks.stub_models import StubEncoder, StubNERPipeline  # noqa: E402
+
+PERCENTILES = (50, 90, 99)
+
+def peak_rss_mb() -> float:
+    #--- ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summarize_samples(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {}
+    summary = {f"p{percentile}": float(np.percentile(samples, percentile)) for percentile in PERCENTILES}
+    summary["mean"] = float(np.mean(samples))
+    summary["max"] = float(np.max(samples))
+    summary["runs"] = len(samples)
+    return summary
+
+class Timings:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+
+    def measure(self, stage: str, run, *args, **kwargs):
+        started = perf_counter()
+        result = run(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(perf_counter() - started)
+        return result
+
+    def report(self) -> dict[str, dict[str, float]]:
+        return {stage: summarize_samples(samples) for stage, samples in self.samples.items()}
+
+def use_in_memory_qdrant() -> None:
+    #--- the shared process-wide client is replaced, DocumindQdrantClient picks it up
+    client = QdrantClient(":memory:")
+    qdrant_client._ensure_collection(client)
+    qdrant_client._ensure_indexes(client)
+    qdrant_client._shared_client = client
+    qdrant_client._shared_client_pid = os.getpid()
+
+def create_workers(args: argparse.Namespace) -> tuple[DocumentWorker, NERWorker, SummarizationWorker]:
+    if args.encoder == "stub":
+        model_registry.register("embedding", StubEncoder)
+    document_worker = DocumentWorker(batch_size=args.batch_size, streaming=args.streaming)
+    ner_worker = NERWorker(args.onnx_model_path, backend="onnx" if args.ner == "onnx" else "pytorch")
+    if args.ner == "stub":
+        model_registry.register(ner_worker.model_name, StubNERPipeline)
+    if not args.inference_cache:
+        #--- repeated runs over the same corpus would otherwise only measure cache hits
+        document_worker.embedding_cache = None
+        ner_worker.entity_cache = None
+    started = perf_counter()
+    model_registry.warmup("embedding", ner_worker.model_name)
+    print(f"[benchmark]\tModels ready in {perf_counter() - started:.2f}s: {model_registry.timings()}")
+    return document_worker, ner_worker, SummarizationWorker()
+
+def ingest_document(
+        db,
+        document_worker: DocumentWorker,
+        document: Document,
+        timings: Timings,
+        streaming: bool) -> int:
+    #--- the same stages as DocumentWorker.process_document, timed one by one
+    if streaming:
+        if not timings.measure("total", document_worker.process_document, db, document):
+            raise RuntimeError(f"Processing document with id: {document.id} failed")
+        return len(chunk_reader_service.get_ordered_chunks(db, document.id))
+    document_worker.document_id = document.id
+    document_worker.user_id = document.user_id
+    started = perf_counter()
+    content = timings.measure("extract", document_worker.extract_document_content, document.file_path)
+    clean_text = timings.measure("clean", document_worker.clean_document_content, content)
+    chunks = timings.measure("chunk", document_worker.chunkify_clean_text, clean_text)
+    embeddings = timings.measure("embed", document_worker.convert_to_embeddings, chunks)
+    chunk_rows = document_worker.to_document_chunk_rows(chunks, embeddings)
+    if not timings.measure("db_save", document_worker.save_document_chunk_rows, db, chunk_rows):
+        raise RuntimeError(f"Saving chunks of document with id: {document.id} failed")
+    if not timings.measure("vector_upsert", document_worker.upload_embeddings, chunk_rows, embeddings):
+        raise RuntimeError(f"Uploading embeddings of document with id: {document.id} failed")
+    timings.samples.setdefault("total", []).append(perf_counter() - started)
+    return len(chunks)
+
+def run_size(
+        session_factory,
+        workers: tuple[DocumentWorker, NERWorker, SummarizationWorker],
+        user_id: int,
+        corpus_document: dict,
+        args: argparse.Namespace) -> dict:
+    document_worker, ner_worker, summarization_worker = workers
+    ingest_timings, scroll_timings, ner_timings, summary_timings = Timings(), Timings(), Timings(), Timings()
+    chunks = 0
+    for run in range(args.warmup + args.repeat):
+        measured = run >= args.warmup
+        with session_factory() as db:
+            document = Document(
+                filename=os.path.basename(corpus_document["path"]),
+                file_path=corpus_document["path"],
+                user_id=user_id)
+            db.add(document)
+            db.commit()
+            timings = ingest_timings if measured else Timings()
+            chunks = ingest_document(db, document_worker, document, timings, args.streaming)
+
+            timings = scroll_timings if measured else Timings()
+            timings.measure(
+                "scroll",
+                DocumindQdrantClient(user_id).scroll_document_chunks,
+                document.id,
+                with_vectors=True)
+
+            task = SimpleNamespace(payload={"document_id": document.id, "user_id": user_id})
+            chunk_reader_service.invalidate_ordered_chunks(document.id)
+            timings = ner_timings if measured else Timings()
+            timings.measure("total", ner_worker.ner_processing, db, task)
+
+            chunk_reader_service.invalidate_ordered_chunks(document.id)
+            timings = summary_timings if measured else Timings()
+            timings.measure("total", summarization_worker.process_summarization_task, db, task)
+            chunk_reader_service.invalidate_ordered_chunks(document.id)
+
+    ingest_seconds = sum(ingest_timings.samples["total"])
+    pages = corpus_document["pages"] * args.repeat
+    return {
+        "document": corpus_document,
+        "chunks": chunks,
+        "ingestion": {
+            "stages": ingest_timings.report(),
+            "pages_per_second": pages / ingest_seconds,
+            "chunks_per_second": chunks * args.repeat / ingest_seconds,
+            "megabytes_per_second": corpus_document["bytes"] * args.repeat / ingest_seconds / 1024 ** 2,
+        },
+        "qdrant_scroll": {
+            **scroll_timings.report()["scroll"],
+            "chunks_per_second": chunks * args.repeat / sum(scroll_timings.samples["scroll"]),
+        },
+        "ner": {
+            **ner_timings.report()["total"],
+            "chunks_per_second": chunks * args.repeat / sum(ner_timings.samples["total"]),
+        },
+        "summarization": {
+            **summary_timings.report()["total"],
+            "chunks_per_second": chunks * args.repeat / sum(summary_timings.samples["total"]),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of ingestion, NER, summarization and Qdrant")
+    parser.add_argument("--sizes", default="small,medium", help=f"comma separated, from {list(CORPUS_SIZES)}")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--corpus-dir", default=os.path.join(".cache", "benchmark_corpus"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--streaming", action="store_true", help="use the streaming document pipeline")
+    parser.add_argument("--encoder", choices=("stub", "model"), default="stub",
+                        help="model: the locally cached EMBEDDING_MODEL_NAME")
+    parser.add_argument("--ner", choices=("stub", "pytorch", "onnx"), default="stub",
+                        help="pytorch/onnx: the locally cached NER model")
+    parser.add_argument("--onnx-model-path", default=os.path.join(tempfile.gettempdir(), "bert_base_ner.onnx"))
+    parser.add_argument("--inference-cache", action="store_true", help="keep the embedding/entity caches on")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(",")
+    corpus = generate_corpus(args.corpus_dir, sizes, args.seed)
+
+    #--- a fresh SQLite file per run, the app engine is never connected
+    shutil.rmtree(BENCHMARK_DIR, ignore_errors=True)
+    os.makedirs(BENCHMARK_DIR)
+    engine = create_engine(f"sqlite:///{os.path.join(BENCHMARK_DIR, 'benchmark.db')}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    use_in_memory_qdrant()
+    with session_factory() as db:
+        user = User(email="benchmark@documind.local", full_name="Benchmark", hashed_password="-")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    workers = create_workers(args)
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "model_timings": model_registry.timings(),
+        "results": {},
+    }
+    for size in sizes:
+        print(f"[benchmark]\tRunning {size} ({corpus[size]['pages']} pages)...")
+        report["results"][size] = run_size(session_factory, workers, user_id, corpus[size], args)
+        ingestion = report["results"][size]["ingestion"]
+        print(f"[{size}]\t{ingestion['pages_per_second']:.1f} pages/s, "
+              f"{ingestion['chunks_per_second']:.1f} chunks/s, "
+              f"peak RSS {report['results'][size]['peak_rss_mb']:.0f} MB")
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"[benchmark]\tResults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
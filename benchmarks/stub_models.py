@@ -0,0 +1,52 @@
+import re
+import zlib
+import numpy as np
+
+from app.vector_database.qdrant_client import VECTOR_SIZE
+
+WORD_PATTERN = re.compile(r"\S+")
+#--- runs of capitalized words, labelled by a stable hash so repeated runs agree
+ENTITY_PATTERN = re.compile(r"\b[A-Z][a-z]+(?:\s+[A-Z][a-zA-Z]+)*")
+ENTITY_GROUPS = ("PER", "ORG", "LOC", "MISC")
+
+class StubEncoder:
+    #--- stands in for SentenceTransformer: hashed bag of words, L2-normalized.
+    #--- Similar texts get similar vectors, so summarization still has structure.
+    def __init__(self, dimension: int = VECTOR_SIZE):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts: list[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[i, zlib.crc32(word.encode("utf-8")) % self.dimension] += 1.0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+class StubTokenizer:
+    #--- whitespace "model tokens", enough for NERWorker.window_document
+    def __call__(self, text: str, **kwargs) -> dict:
+        return {"offset_mapping": [match.span() for match in WORD_PATTERN.finditer(text)]}
+
+class StubNERPipeline:
+    #--- stands in for the transformers "ner" pipeline (aggregation_strategy="simple")
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def __call__(self, texts: list[str], batch_size: int = 32) -> list[list[dict]]:
+        return [
+            [
+                {
+                    "entity_group": ENTITY_GROUPS[zlib.crc32(match.group().encode("utf-8")) % len(ENTITY_GROUPS)],
+                    "score": np.float32(0.99),
+                    "word": match.group(),
+                    "start": match.start(),
+                    "end": match.end(),
+                }
+                for match in ENTITY_PATTERN.finditer(text)
+            ]
+            for text in texts
+        ]
@@ -0,0 +1,117 @@
+import os
+import random
+import hashlib
+import argparse
+
+import fitz
+
+#--- pages per document for every corpus size
+CORPUS_SIZES = {
+    "small": 5,
+    "medium": 50,
+    "large": 1000,
+}
+DEFAULT_SEED = 1234
+WORDS_PER_PAGE = 450
+#--- fixed metadata and no new /ID, so the same seed always gives the same bytes
+PDF_METADATA = {
+    "title": "DocuMind synthetic benchmark document",
+    "author": "DocuMind",
+    "creator": "benchmarks.synthetic_corpus",
+    "producer": "PyMuPDF",
+    "creationDate": "D:20250101000000Z",
+    "modDate": "D:20250101000000Z",
+}
+
+VOCABULARY = (
+    "agreement party obligation clause term payment invoice delivery service "
+    "contract liability notice period schedule amendment termination report "
+    "revenue quarter growth market customer product supplier warranty license "
+    "the of and to in a for on with by at from that this is are was be will "
+    "shall may must not any all each such other under within between during "
+    "data system process analysis result model value risk policy review audit"
+).split()
+PERSONS = [
+    "Angela Merkel", "John Smith", "Maria Garcia", "Ana Petrova", "David Chen",
+    "Elena Rossi", "Marko Jovanovski", "Sarah Johnson",
+]
+ORGANIZATIONS = [
+    "Siemens AG", "European Commission", "World Health Organization", "Reuters",
+    "Baker McKenzie", "United Nations", "Microsoft", "Deutsche Bank",
+]
+LOCATIONS = [
+    "Berlin", "Paris", "Skopje", "Geneva", "London", "New York", "Brussels", "Tokyo",
+]
+
+def generate_sentence(rng: random.Random) -> str:
+    words = rng.choices(VOCABULARY, k=rng.randint(8, 20))
+    #--- roughly every second sentence mentions an entity, so NER has work to do
+    if rng.random() < 0.5:
+        entity = rng.choice(rng.choice((PERSONS, ORGANIZATIONS, LOCATIONS)))
+        words.insert(rng.randint(0, len(words)), entity)
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + "."
+
+def generate_page_text(rng: random.Random, page_number: int) -> str:
+    sentences = [f"Section {page_number + 1}."]
+    words = 0
+    while words < WORDS_PER_PAGE:
+        sentence = generate_sentence(rng)
+        sentences.append(sentence)
+        words += sentence.count(" ") + 1
+    return " ".join(sentences)
+
+def write_pdf(path: str, pages: int, seed: int) -> None:
+    #--- one generator per document, seeded by (seed, pages), so a size can be
+    #--- regenerated on its own without changing the others
+    rng = random.Random(f"{seed}:{pages}")
+    with fitz.open() as pdf:
+        for page_number in range(pages):
+            page = pdf.new_page()
+            rect = page.rect + (50, 50, -50, -50)
+            page.insert_textbox(rect, generate_page_text(rng, page_number), fontsize=8)
+        pdf.set_metadata(PDF_METADATA)
+        pdf.save(path, garbage=3, deflate=True, no_new_id=True)
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def generate_corpus(
+        output_dir: str,
+        sizes: list[str] | None = None,
+        seed: int = DEFAULT_SEED) -> dict[str, dict]:
+    #--- documents already generated with the same seed are reused
+    os.makedirs(output_dir, exist_ok=True)
+    corpus = {}
+    for size in sizes or list(CORPUS_SIZES):
+        if size not in CORPUS_SIZES:
+            raise ValueError(f"Unknown corpus size: {size}, expected one of {list(CORPUS_SIZES)}")
+        pages = CORPUS_SIZES[size]
+        path = os.path.join(output_dir, f"{size}_{pages}p_seed{seed}.pdf")
+        if not os.path.exists(path):
+            print(f"[corpus]\tGenerating {size} document ({pages} pages)...")
+            write_pdf(path, pages, seed)
+        corpus[size] = {
+            "path": path,
+            "pages": pages,
+            "bytes": os.path.getsize(path),
+            "sha256": file_sha256(path),
+        }
+    return corpus
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate the deterministic synthetic PDF corpus")
+    parser.add_argument("--output-dir", default=os.path.join(".cache", "benchmark_corpus"))
+    parser.add_argument("--sizes", default=",".join(CORPUS_SIZES))
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+    corpus = generate_corpus(args.output_dir, args.sizes.split(","), args.seed)
+    for size, document in corpus.items():
+        print(f"[{size}]\t{document}")
+
+if __name__ == "__main__":
+    main()